@@ -0,0 +1,74 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+# Microbenchmark of the script generation latency for dataflows of 10, 100 and 1000 nodes, comparing the
+# compilation of the template on every request (as done before) with the template compiled once per process.
+#
+# Usage, from the simple-backend folder:
+#
+#     python benchmarks/bench_script_generation.py
+
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'simple_backend'))
+
+from jinja2 import BaseLoader, Environment
+from schemas.nodes import Node, NodeThen
+from service.dag_generator import get_edges
+from service.script_generator import ScriptGenerator, template
+
+SIZES = [10, 100, 1000]
+REPEAT = 5
+
+
+def make_nodes(size: int):
+    nodes = []
+    for i in range(size):
+        then = [NodeThen(to_node=f"node{i + 1}", from_port="dataset", to_port="dataset")] if i < size - 1 else None
+        nodes.append(Node(node_id=f"node{i}", node="rain.nodes.pandas.pandas_io.PandasCSVLoader",
+                          parameters={"path": f"data{i}.csv", "delim": ",", "index_col": i}, then=then))
+    return nodes
+
+
+def generate_compiling_every_time(nodes, edges):
+    jinja_template = Environment(loader=BaseLoader()).from_string(template)
+    return jinja_template.render({"rain_module": "rain", "nodes": nodes, "edges": edges})
+
+
+def generate_with_cached_template(nodes, edges):
+    return ScriptGenerator(nodes, edges).generate_script()
+
+
+def main():
+    print(f"{'nodes':>6} {'before (ms)':>12} {'after (ms)':>12} {'speedup':>8}")
+    for size in SIZES:
+        nodes = make_nodes(size)
+        edges = list(get_edges(nodes).values())
+        number = max(1, 1000 // size)
+        assert generate_compiling_every_time(nodes, edges) == generate_with_cached_template(nodes, edges)
+        before = min(timeit.repeat(lambda: generate_compiling_every_time(nodes, edges), number=number,
+                                   repeat=REPEAT)) / number
+        after = min(timeit.repeat(lambda: generate_with_cached_template(nodes, edges), number=number,
+                                  repeat=REPEAT)) / number
+        print(f"{size:>6} {before * 1000:>12.3f} {after * 1000:>12.3f} {before / after:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+# Benchmark of the extraction of nodes, parameters and edges from generated scripts of up to 5000 nodes, comparing
+# the regular expressions previously used by the script api with the single AST walk of the script parser.
+#
+# Usage, from the simple-backend folder:
+#
+#     python benchmarks/bench_script_parser.py
+
+import ast
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'simple_backend'))
+
+from schemas.nodes import Node, NodeThen
+from service.dag_generator import get_edges
+from service.script_generator import ScriptGenerator
+from service.script_parser import parse_script
+
+SIZES = [100, 1000, 5000]
+REPEAT = 3
+
+
+def make_script(size: int):
+    nodes = []
+    for i in range(size):
+        then = [NodeThen(to_node=f"node{i + 1}", from_port="dataset", to_port="dataset")] if i < size - 1 else None
+        nodes.append(Node(node_id=f"node{i}", node="rain.nodes.pandas.pandas_io.PandasCSVLoader",
+                          parameters={"path": f"data{i}.csv", "delim": ",", "index_col": i}, then=then))
+    return ScriptGenerator(nodes, list(get_edges(nodes).values())).generate_script()
+
+
+def extract_with_regex(code):
+    ast.parse(code)
+    library = 'rain'
+    if 'import rain as' in code:
+        library = re.compile(r'import rain as (?P<library>.*)').search(code).group('library').strip()
+
+    nodes_classes = re.compile(
+        r'(?P<node>.+?) *?= *?' + re.escape(library) + r'\.(?P<clazz>.+?)\([^\"]').findall(code)
+
+    params = {}
+    for n, c in nodes_classes:
+        node_params = re.compile(
+            re.escape(n) + r' *?= *?' + re.escape(library) + r'\.' + re.escape(c) + r'\((?P<params>.+?)\)',
+            re.DOTALL)
+        params[n] = {}
+        for param_line in node_params.search(code).group("params").strip().splitlines():
+            (name, value) = re.compile(r'(?P<name>.+?) *?= *(?P<value>.*?),?$').search(param_line.strip()).groups()
+            params[n][name] = ast.literal_eval(value)
+
+    edges = []
+    edges_code = re.compile(r'add_edges\(\[(?P<edges>.+?)\]\)', re.DOTALL).search(code).group("edges")
+    for edge_line in edges_code.strip().splitlines():
+        edges.append(re.compile(
+            r'(?P<from_node>.+?) *?@ *?\'(?P<from_var>.+?)\' *?> *(?P<to_node>.*?) *?@ *?\'(?P<to_var>.+?)\',?$')
+            .search(edge_line.strip()).groups())
+
+    return [(n, c) for n, c in nodes_classes], params, edges
+
+
+def extract_with_ast(code):
+    script = parse_script(code)
+    params = {n.name: {k: ast.literal_eval(v) for k, v in n.params.items()} for n in script.nodes}
+    edges = [(e.from_node, e.from_var, e.to_node, e.to_var) for e in script.edges]
+    return [(n.name, n.clazz) for n in script.nodes], params, edges
+
+
+def main():
+    print(f"{'nodes':>6} {'regex (ms)':>11} {'ast (ms)':>10} {'speedup':>8}")
+    for size in SIZES:
+        code = make_script(size)
+        number = max(1, 1000 // size)
+        assert extract_with_regex(code) == extract_with_ast(code)
+        before = min(timeit.repeat(lambda: extract_with_regex(code), number=number, repeat=REPEAT)) / number
+        after = min(timeit.repeat(lambda: extract_with_ast(code), number=number, repeat=REPEAT)) / number
+        print(f"{size:>6} {before * 1000:>11.3f} {after * 1000:>10.3f} {before / after:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -28,6 +28,7 @@ from starlette.middleware.trustedhost import TrustedHostMiddleware
 from config import here
 from controller.routes import initialize_api_routes
 from errors import register_errors
+from service.database_indexes import ensure_indexes
 
 
 def create_app():
@@ -43,6 +44,7 @@ def create_app():
     app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
     app.include_router(initialize_api_routes())
     register_errors(app)
+    app.add_event_handler("startup", ensure_indexes)
 
     if not app.debug:
         static_files_folder = os.path.join(os.path.dirname(__file__), 'static')
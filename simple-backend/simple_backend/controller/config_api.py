@@ -46,6 +46,14 @@ async def post_config(config: ConfigurationSchema):
     return dataflow
 
 
+@router.get('/cache')
+async def get_script_cache_stats():
+    """
+    Api used to retrieve the hit/miss counters of the generated scripts cache
+    """
+    return config_service.get_script_cache_stats()
+
+
 @router.post('/convert', response_model=str)
 async def convert_to_script(nodes: list[Union[CustomNode, Node]]):
     """
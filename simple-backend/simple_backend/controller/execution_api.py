@@ -15,15 +15,18 @@
  You should have received a copy of the GNU General Public License
  along with this program.  If not, see <https://www.gnu.org/licenses/>.
  """
-from typing import List, Union
-from fastapi import APIRouter, Depends
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, Header, Query
 from fastapi.responses import Response
 from starlette.status import HTTP_200_OK
 from sse_starlette.sse import EventSourceResponse
 from schemas.nodes import UINode, CustomNodeStructure, NodeStructure
 from service.config_service import get_requirements
 import service.execution_service as es
+from service.execution_queues import MAX_PRIORITY, QUEUE_PRIORITIES
+from service.log_storage import LOG_PAGE_CHUNKS, LOG_PAGE_MAX_CHUNKS
 from controller.standard_auth_api import get_current_user
+from controller.json_stream import json_array_response
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -31,14 +34,17 @@ load_dotenv()
 router = APIRouter()
 
 @router.post('', status_code=200, response_class=Response)
-def execute(config: dict, user = Depends(get_current_user)) -> None:
+def execute(config: dict, queue: Optional[str] = Query(None, regex=f"^({'|'.join(QUEUE_PRIORITIES)})$"),
+            priority: Optional[int] = Query(None, ge=0, le=MAX_PRIORITY),
+            user = Depends(get_current_user)) -> None:
     """
-    Api used to launch the execution of a dataflow
+    Api used to launch the execution of a dataflow.
+    The queue (interactive, batch or heavy) is inferred from the requirements and the previous executions of the
+    dataflow when not given, and the priority defaults to the one of the queue.
     """
     user_id = user['_id']
     execution_id = es.create_execution_instance(config, user_id)
-    task_id = es.execute_dataflow.delay(execution_id, user_id)
-    es.set_execution_field(execution_id, 'celery_task_id', str(task_id))
+    es.submit_execution(execution_id, user_id, queue, priority)
     return Response(status_code=HTTP_200_OK)
 
 
@@ -61,11 +67,12 @@ def post_nodes_requirements(libs: List[str], ui_nodes: List[UINode],
     
 
 @router.get('/info')
-def get_executions(user = Depends(get_current_user)):
+def get_executions(limit: int = Query(0, ge=0), after: Optional[str] = None, user = Depends(get_current_user)):
     """
-    Api used to retrieve name and status of all the executions
+    Api used to retrieve name and status of the executions, in order of creation, up to limit (0 for all)
+    and starting after the execution with the given id
     """
-    return es.get_all_executions_status(user)
+    return json_array_response(es.get_all_executions_status(user, limit, after))
     
 
 @router.get('/{id}/info/{field}')
@@ -82,15 +89,36 @@ def get_execution_logs(id: str):
     Api used to retrieve the info of a specific execution
     """
     execution = es.get_execution_instance(id)
+    if 'logs' in execution:
+        # executions created before the logs were moved to their own collection
+        logs, logs_from_seq = execution['logs'], 0
+    else:
+        tail = es.get_execution_log_tail(id)
+        logs = [line for chunk in tail for line in chunk['lines']]
+        logs_from_seq = tail[0]['seq'] if tail else 0
     return {
         'id': id,
         'status': execution['status'],
         'name': execution['name'],
-        'logs': execution['logs'],
+        'logs': logs,
+        'logs_from_seq': logs_from_seq,
         'ui': execution['ui'],
     }
 
 
+@router.get('/{id}/logs')
+def get_execution_log_chunks(id: str, from_seq: int = Query(0, ge=0),
+                             limit: int = Query(LOG_PAGE_CHUNKS, ge=1, le=LOG_PAGE_MAX_CHUNKS),
+                             tail: Optional[int] = Query(None, ge=1, le=LOG_PAGE_MAX_CHUNKS)):
+    """
+    Api used to retrieve a page of the log chunks of a specific execution, starting from a sequence number or the
+    last ones
+    """
+    if tail is not None:
+        return es.get_execution_log_tail(id, tail)
+    return es.get_execution_log_chunks(id, from_seq, limit)
+
+
 @router.delete('/{id}/info')
 def delete_execution_logs(id: str):
     """
@@ -99,17 +127,27 @@ def delete_execution_logs(id: str):
     return es.delete_execution_instance(id)
 
 
+@router.get("/watch/stats")
+async def get_watch_stats():
+    """
+    Api used to retrieve the subscribers and queue depths of the shared change streams
+    """
+    return es.get_watch_stats()
+
+
 @router.get("/watch")
-async def watch_executions():
+async def watch_executions(last_event_id: Optional[str] = Header(None)):
     """
-    Api used to receive updates on the executions
+    Api used to receive updates on the executions.
+    Reconnecting clients resume after the event in the Last-Event-ID header.
     """
-    return EventSourceResponse(content=es.watch_executions())
+    return EventSourceResponse(content=es.watch_executions(last_event_id))
 
 
 @router.get("/watch/{id}")
-async def watch_execution(id: str):
+async def watch_execution(id: str, last_event_id: Optional[str] = Header(None)):
     """
-    Api used to receive updates on a specific execution
+    Api used to receive updates on a specific execution.
+    Reconnecting clients resume after the event in the Last-Event-ID header.
     """
-    return EventSourceResponse(content=es.watch_execution(id))
+    return EventSourceResponse(content=es.watch_execution(id, last_event_id))
@@ -0,0 +1,45 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import itertools
+import json
+from typing import Iterable, Iterator
+from fastapi.responses import StreamingResponse
+
+
+def encode_json_array(documents: Iterable[dict]) -> Iterator[bytes]:
+    """
+    Method that encodes the documents as a JSON array, one document at a time
+    """
+    yield b"["
+    separator = b""
+    for document in documents:
+        yield separator + json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        separator = b","
+    yield b"]"
+
+
+def json_array_response(documents: Iterable[dict]) -> StreamingResponse:
+    """
+    Returns a response that sends the documents as a JSON array while they are read from the database.
+    The first document is read before the response starts, so that a failing query is reported as an error,
+    while an error in the middle of the stream aborts the response instead of closing the array.
+    """
+    body = encode_json_array(documents)
+    head = next(body) + next(body)
+    return StreamingResponse(itertools.chain([head], body), media_type="application/json")
@@ -16,21 +16,44 @@
  along with this program.  If not, see <https://www.gnu.org/licenses/>.
  """
 
-from fastapi import APIRouter, Depends
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import Response
+from starlette.status import HTTP_304_NOT_MODIFIED
 from errors import BadRequestError
 from schemas.nodes import NodeStructure, CustomNodeIOParams, CustomNodeSchema
 from service import node_service
-from service.node_service import parse_custom_node_code
 
 
+NODES_CACHE_CONTROL = os.environ.get("NODES_CACHE_CONTROL", "public, no-cache")
+
 router = APIRouter()
 
 @router.get('', response_model=list[NodeStructure])
-async def get_nodes():
+async def get_nodes(if_none_match: Optional[str] = Header(None), accept_encoding: Optional[str] = Header(None)):
     """
-    Api used to get all the available nodes
+    Api used to get all the available nodes.
+    The catalog is served pre-serialized, and a request carrying its current ETag gets an empty 304 response.
     """
-    return node_service.get_nodes_structure()
+    catalog = node_service.get_nodes_catalog()
+    gzip_etag = catalog.etag[:-1] + '-gzip"'
+    headers = {"Cache-Control": NODES_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+    gzip_accepted = accept_encoding and 'gzip' in accept_encoding.lower()
+
+    if if_none_match:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        # the tag that matched is sent back, so that the client keeps the validator of the body it has
+        served_etag = gzip_etag if gzip_accepted else catalog.etag
+        matched = [tag for tag in (served_etag, catalog.etag, gzip_etag) if tag in tags or '*' in tags]
+        if matched:
+            return Response(status_code=HTTP_304_NOT_MODIFIED, headers={**headers, "ETag": matched[0]})
+
+    if gzip_accepted:
+        return Response(catalog.gzip_body, media_type="application/json",
+                        headers={**headers, "ETag": gzip_etag, "Content-Encoding": "gzip"})
+    return Response(catalog.body, media_type="application/json", headers={**headers, "ETag": catalog.etag})
 
 
 @router.post('/custom', response_model=CustomNodeIOParams)
@@ -40,8 +63,7 @@ async def check_custom_node(custom: CustomNodeSchema):
     """
     language = custom.language
     # TODO: use language variable to support and perform the correct analysis of other programming languages' code
-    parsed_code = parse_custom_node_code(custom.code, custom.function_name)
-    return node_service.find_custom_node_params(parsed_code, custom.function_name)
+    return node_service.get_custom_node_params(custom.code, custom.function_name)
 
 
 @router.get('/{clazz}', responses={200: {"model": NodeStructure}, 404: {"schema": BadRequestError}})
@@ -16,7 +16,8 @@
  along with this program.  If not, see <https://www.gnu.org/licenses/>.
  """
 
-from fastapi import APIRouter, Response, Depends
+from typing import Optional
+from fastapi import APIRouter, Response, Depends, Query
 from starlette.status import HTTP_204_NO_CONTENT
 import config
 from errors import BadRequestError
@@ -24,21 +25,24 @@ from schemas.dataflow import DataFlow
 from schemas.repository_schemas import RepositoryGet, RepositoryPost
 import service.repository_service as rs
 from controller.standard_auth_api import get_current_user
+from controller.json_stream import json_array_response
 
 
 router = APIRouter()
 
 
 @router.get('', response_model=list[object])
-async def get_repositories(user = Depends(get_current_user)):
-    """ Gets all the repositories. """
-    return rs.get_repositories_names(user)
+async def get_repositories(limit: int = Query(0, ge=0), after: Optional[str] = None,
+                           user = Depends(get_current_user)):
+    """ Gets the repositories, up to limit (0 for all) and starting after the repository with the given id. """
+    return json_array_response(rs.get_repositories_names(user, limit, after))
 
 
 @router.get('/archived', response_model=list[object])
-async def get_archived_repositories(user = Depends(get_current_user)):
-    """ Gets all the archived repositories. """
-    return rs.get_archived_repositories_names(user)
+async def get_archived_repositories(limit: int = Query(0, ge=0), after: Optional[str] = None,
+                                    user = Depends(get_current_user)):
+    """ Gets the archived repositories, up to limit (0 for all) and starting after the repository with the given id. """
+    return json_array_response(rs.get_archived_repositories_names(user, limit, after))
 
 
 @router.get('/{repository}')
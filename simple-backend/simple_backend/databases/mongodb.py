@@ -1,5 +1,5 @@
-from pymongo import MongoClient
-from service.database_service import DatabaseService
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from service.database_service import DatabaseService, WriteResult
 from json import dumps
 
 DATABASE_NAME='rainfall'
@@ -21,35 +21,32 @@ class MongoDB(DatabaseService):
             print(f"An error occurred: {str(e)}")
 
 
-    def get_document(self, collection_id: str, filter: dict, projection: dict = {}):
+    def upsert_document(self, collection_id: str, document: dict):
         try:
             collection = self.db[collection_id]
-            return collection.find_one(filter, projection)
-            
+            collection.replace_one({"_id": document["_id"]}, document, upsert=True)
+
         except ConnectionError:
-            print("Connection to the database failed.")
+            print("Connection to the MongoDB server failed.")
         except Exception as e:
             print(f"An error occurred: {str(e)}")
 
 
-    def delete_document(self, collection_id: str, document_id: str):
+    def get_document(self, collection_id: str, filter: dict, projection: dict = {}):
         try:
             collection = self.db[collection_id]
-            collection.delete_one({"_id": document_id})
+            return collection.find_one(filter, projection)
             
         except ConnectionError:
             print("Connection to the database failed.")
         except Exception as e:
             print(f"An error occurred: {str(e)}")
-            
 
-    def get_document_field(self, collection_id: str, document_id: str, field_name: str):
+
+    def get_documents(self, collection_id: str, filter: dict, projection: dict = None, sort: list = None, limit: int = 0):
         try:
             collection = self.db[collection_id]
-            document = collection.find_one({"_id": document_id}, {field_name: 1})
-
-            if document:
-                return document.get(field_name)
+            return list(collection.find(filter, projection, sort=sort, limit=limit))
 
         except ConnectionError:
             print("Connection to the database failed.")
@@ -57,23 +54,21 @@ class MongoDB(DatabaseService):
             print(f"An error occurred: {str(e)}")
 
 
-    def set_document_field(self, collection_id: str,  document_id: str, field_name: str, field_value: str):
+    def delete_document(self, collection_id: str, document_id: str):
         try:
             collection = self.db[collection_id]
-            document = collection.find_one({"_id": document_id})
-            if document:
-                collection.update_one({"_id": document_id}, {"$set": {field_name: field_value}})
+            collection.delete_one({"_id": document_id})
             
         except ConnectionError:
             print("Connection to the database failed.")
         except Exception as e:
             print(f"An error occurred: {str(e)}")
+            
 
-
-    def push_document_array_field(self, collection_id: str, document_id: str, field_name: str, field_value: str):
+    def delete_documents(self, collection_id: str, filter: dict):
         try:
             collection = self.db[collection_id]
-            collection.update_one({"_id": document_id}, {"$push": {field_name: field_value}})
+            collection.delete_many(filter)
 
         except ConnectionError:
             print("Connection to the database failed.")
@@ -81,31 +76,24 @@ class MongoDB(DatabaseService):
             print(f"An error occurred: {str(e)}")
 
 
-    def pull_document_array_field(self, collection_id: str, document_id: str, field_name: str, field_value: str):
+    def create_index(self, collection_id: str, keys: list, **options):
         try:
             collection = self.db[collection_id]
-            collection.update_one({"_id": document_id}, {"$pull": {field_name: field_value}})
+            collection.create_index(keys, **options)
 
         except ConnectionError:
             print("Connection to the database failed.")
         except Exception as e:
             print(f"An error occurred: {str(e)}")
-        
 
-    def get_all_documents_fields(self, collection_id: str, projection: dict, filter: dict = {}):
+
+    def get_document_field(self, collection_id: str, document_id: str, field_name: str):
         try:
             collection = self.db[collection_id]
-            documents = list(collection.find(filter, projection))
-            result = []
-            for document in documents:
-                output_doc = {}
-                for key in projection.keys():
-                    if(key == "_id"):
-                        output_doc["id"] = str(document[key])
-                    else:
-                        output_doc[key] = str(document[key])
-                result.append(output_doc)
-            return result
+            document = collection.find_one({"_id": document_id}, {field_name: 1})
+
+            if document:
+                return document.get(field_name)
 
         except ConnectionError:
             print("Connection to the database failed.")
@@ -113,32 +101,105 @@ class MongoDB(DatabaseService):
             print(f"An error occurred: {str(e)}")
 
 
-    def watch_document(self, collection_id: str, update_function):    
-        try:
-            collection = self.db[collection_id]
-            pipeline = [{'$match': {'operationType': 'update'}}]
-            with collection.watch(pipeline) as stream:
-                for change in stream:
-                    document_update = change["updateDescription"]["updatedFields"]
-                    yield update_function(document_update)
+    def set_document_field(self, collection_id: str,  document_id: str, field_name: str, field_value: str):
+        return self.set_document_fields(collection_id, document_id, {field_name: field_value})
+
+
+    def set_document_fields(self, collection_id: str, document_id: str, fields: dict):
+        collection = self.db[collection_id]
+        result = collection.update_one({"_id": document_id}, {"$set": fields})
+        return WriteResult(result.matched_count, result.modified_count)
+
+
+    def push_document_array_field(self, collection_id: str, document_id: str, field_name: str, field_value: str):
+        collection = self.db[collection_id]
+        result = collection.update_one({"_id": document_id}, {"$push": {field_name: field_value}})
+        return WriteResult(result.matched_count, result.modified_count)
+
 
+    def pull_document_array_field(self, collection_id: str, document_id: str, field_name: str, field_value: str):
+        collection = self.db[collection_id]
+        result = collection.update_one({"_id": document_id}, {"$pull": {field_name: field_value}})
+        return WriteResult(result.matched_count, result.modified_count)
+        
+
+    def get_all_documents_fields(self, collection_id: str, projection: dict, filter: dict = {}):
+        try:
+            return list(self.iter_documents_fields(collection_id, projection, filter))
         except ConnectionError:
             print("Connection to the database failed.")
         except Exception as e:
-            print(f"An error occurred: {str(e.with_traceback)}")
+            print(f"An error occurred: {str(e)}")
 
 
-    def watch_documents(self, collection_id: str, update_function):
+    def iter_documents_fields(self, collection_id: str, projection: dict, filter: dict = {}, limit: int = 0,
+                              after: str = None, sort_field: str = "_id", descending: bool = False):
+        """
+        Yields the projected fields of the documents matching the filter, as get_all_documents_fields returns them,
+        while they are read from the cursor.
+        Documents are ordered by the sort field and then by _id, and a page starts after the document with the given
+        id (keyset pagination), so that no page has to skip the previous ones. An unknown id gives an empty page.
+        Errors are raised to the consumer, since the documents already yielded may have been sent to a client.
+        """
+        collection = self.db[collection_id]
+        direction = DESCENDING if descending else ASCENDING
+        operator = "$lt" if descending else "$gt"
+        query = filter
+        if after is not None:
+            if sort_field == "_id":
+                keyset = {"_id": {operator: after}}
+            else:
+                last = collection.find_one({"_id": after}, {sort_field: 1})
+                if last is None:
+                    return
+                value = last.get(sort_field)
+                keyset = {"$or": [{sort_field: {operator: value}}, {sort_field: value, "_id": {operator: after}}]}
+            query = {"$and": [filter, keyset]} if filter else keyset
+        sort = [(sort_field, direction)] + ([("_id", direction)] if sort_field != "_id" else [])
+
+        with collection.find(query, projection, sort=sort, limit=limit) as cursor:
+            for document in cursor:
+                yield {("id" if key == "_id" else key): str(document[key]) for key in projection.keys()}
+
+
+    def watch_changes(self, collection_id: str, operation_type: str, fields: list = None, document_id: str = None,
+                      document_filter: dict = None, resume_after: str = None, max_await_time_ms: int = 1000):
+        """
+        Yields the changes of a collection with the given operation type (and, for updates, modifying at least one
+        of the given fields), and None after each max_await_time_ms without changes, so that the consumer can stop
+        watching even when the collection is idle.
+        The changes can be restricted to a document id or, for inserts, to the documents matching a filter,
+        and the stream can resume after the resume token (_id._data) of a previous change.
+        """
         try:
             collection = self.db[collection_id]
-            pipeline = [{'$match': {'operationType': 'update'}}]
-            with collection.watch(pipeline) as stream:
-                for change in stream:
-                    pipeline_id = str(change["documentKey"]["_id"])
-                    updated_document = change["updateDescription"]["updatedFields"]
-                    yield update_function(updated_document, pipeline_id)
-        
+            match = {'operationType': operation_type, **updated_fields_match(fields or [])}
+            if document_id is not None:
+                match['documentKey._id'] = document_id
+            match.update({f'fullDocument.{key}': value for key, value in (document_filter or {}).items()})
+            pipeline = [{'$match': match}]
+            if fields:
+                pipeline.append({'$project': updated_fields_projection(fields)})
+            options = {'resume_after': {'_data': resume_after}} if resume_after else {}
+            with collection.watch(pipeline, max_await_time_ms=max_await_time_ms, **options) as stream:
+                while stream.alive:
+                    yield stream.try_next()
+
         except ConnectionError:
             print("Connection to the database failed.")
         except Exception as e:
-            print(f"An error occurred: {str(e.with_traceback)}")
\ No newline at end of file
+            print(f"An error occurred: {str(e)}")
+
+
+def updated_fields_match(fields: list) -> dict:
+    """
+    Returns the change stream conditions matching the updates that modify at least one of the given fields
+    """
+    conditions = [{f'updateDescription.updatedFields.{field}': {'$exists': True}} for field in fields]
+    return {'$or': conditions} if conditions else {}
+
+
+def updated_fields_projection(fields: list) -> dict:
+    projection = {'operationType': 1, 'ns': 1, 'documentKey': 1}
+    projection.update({f'updateDescription.updatedFields.{field}': 1 for field in fields})
+    return projection
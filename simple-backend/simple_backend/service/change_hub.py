@@ -0,0 +1,377 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import asyncio
+import concurrent.futures
+import itertools
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Iterator, List, Optional
+
+CHANGE_HUB_QUEUE_SIZE = int(os.environ.get("CHANGE_HUB_QUEUE_SIZE", "256"))
+CHANGE_HUB_REPLAY_SIZE = int(os.environ.get("CHANGE_HUB_REPLAY_SIZE", "1024"))
+CHANGE_HUB_RETRY_SECONDS = float(os.environ.get("CHANGE_HUB_RETRY_SECONDS", "1"))
+
+
+def format_event_id(tokens: dict) -> str:
+    """
+    Returns the SSE event id holding the resume token of the last change received from each hub
+    """
+    return ",".join(f"{name}:{token}" for name, token in sorted(tokens.items()) if token)
+
+
+def parse_event_id(event_id: Optional[str]) -> dict:
+    """
+    Returns the resume tokens, by hub name, of an SSE event id (e.g. the Last-Event-ID header)
+    """
+    tokens = {}
+    for item in (event_id or "").split(","):
+        name, _, token = item.partition(":")
+        if name and token:
+            tokens[name] = token
+    return tokens
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, function: Callable, *args):
+    """
+    Runs the function in the event loop and returns its result to the calling thread
+    """
+    future = concurrent.futures.Future()
+
+    def run():
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    loop.call_soon_threadsafe(run)
+    return future.result()
+
+
+class Subscription:
+    """
+    Bounded queue of the changes delivered by one or more hubs to a single client.
+
+    A coalescing subscription keeps at most one pending change for each routing key, replacing it with the newer
+    one, which is fine when only the latest state of each document matters (e.g. the status of the executions).
+    When the queue is full, or a non coalescing subscription falls behind, the subscription is closed, so that the
+    client reconnects instead of silently missing changes.
+    The resume token of the last change consumed from each hub is available as event_id.
+    A hub that cannot resume from the token of the client queues a reset, consumed as None, after which the client
+    has to reload the whole state.
+    """
+
+    def __init__(self, queue_size: int = CHANGE_HUB_QUEUE_SIZE, coalesce: bool = False):
+        self._queue_size = queue_size
+        self._pending = OrderedDict()
+        self._sequence = itertools.count()
+        self._ready = asyncio.Event()
+        self._ended = False
+        self._coalesce = coalesce
+        self._hubs = []
+        self.tokens = {}
+        self.closed = False
+        self.coalesced = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def event_id(self) -> str:
+        return format_event_id(self.tokens)
+
+    def _put(self, hub_name: str, key: str, change: dict) -> bool:
+        pending_key = (hub_name, key) if self._coalesce else next(self._sequence)
+        if pending_key in self._pending:
+            # moved to the end, so that changes are still consumed in the order of their resume tokens
+            self._pending.move_to_end(pending_key)
+            self.coalesced += 1
+        elif len(self._pending) >= self._queue_size:
+            return False
+        self._pending[pending_key] = (hub_name, change)
+        self._ready.set()
+        return True
+
+    def _reset(self, hub_name: str):
+        if not self._put(hub_name, None, None):
+            self._drop()
+
+    def _drop(self):
+        self.close()
+        self._pending.clear()
+        self._end()
+
+    def _end(self):
+        self.close()
+        # the reader stops once the changes already queued have been consumed
+        self._ended = True
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        for hub, key in self._hubs:
+            hub._detach(self, key)
+        self._hubs = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._pending:
+            if self.closed or self._ended:
+                raise StopAsyncIteration
+            self._ready.clear()
+            await self._ready.wait()
+        _, (hub_name, change) = self._pending.popitem(last=False)
+        if change is not None:
+            self.tokens[hub_name] = change["_id"]["_data"]
+        return change
+
+
+class ChangeStreamHub:
+    """
+    Process-wide consumer of a single change stream, whose changes are fanned out to the subscriptions
+    registered for their routing key (e.g. the execution id) or for every key.
+
+    The blocking stream is read by a dedicated thread that hands every change off to the event loop, so that
+    the subscribers are plain asyncio consumers and never hold a worker thread. The thread is started when the
+    first subscription is attached and stops once the last one is gone.
+    watch_function must return an iterator of changes yielding None while the stream is idle.
+
+    The last changes are kept in a replay buffer, so that a client reconnecting with the resume token of the
+    last change it received gets the ones it missed. Older tokens are served by a dedicated stream, opened
+    through resume_function(token), which is only read until it catches up with the shared one: as soon as it
+    yields a change of the replay buffer, or is idle while the shared stream has not received any change, the
+    subscription is attached to the shared stream and the dedicated one is closed. A token that cannot be resumed
+    (e.g. older than the oplog) gets a reset, followed by the live changes.
+    Large changes can be kept in the replay buffer reduced by compact_function, restore_function reading back
+    the replayed ones.
+    """
+
+    def __init__(self, name: str, watch_function: Callable[[], Iterator[Optional[dict]]],
+                 key_function: Callable[[dict], str],
+                 resume_function: Callable[[str], Iterator[Optional[dict]]] = None,
+                 compact_function: Callable[[dict], dict] = None,
+                 restore_function: Callable[[List[dict]], List[dict]] = None):
+        self.name = name
+        self._watch_function = watch_function
+        self._key_function = key_function
+        self._resume_function = resume_function
+        self._compact_function = compact_function or (lambda change: change)
+        self._restore_function = restore_function or (lambda changes: changes)
+        self._subscriptions = {}
+        self._replay = deque(maxlen=CHANGE_HUB_REPLAY_SIZE)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._open = False
+        self._opens = 0
+        self._resuming = 0
+        self.last_token = None
+        self.events = 0
+        self.dropped = 0
+        self.replayed = 0
+        self.resumed = 0
+
+    def attach(self, subscription: Subscription, key: str = None, resume_after: str = None):
+        """
+        Delivers to the subscription the changes with the given routing key, or all of them if key is None.
+        If resume_after is given, the changes that followed that resume token are delivered first.
+        """
+        if resume_after is not None and not self._replay_after(subscription, key, resume_after):
+            if self._resume_function is not None:
+                self._resume(subscription, key, resume_after)
+                return
+        self._subscriptions.setdefault(key, set()).add(subscription)
+        subscription._hubs.append((self, key))
+        self._start()
+        subscription.tokens[self.name] = resume_after or self.last_token
+
+    def _start(self):
+        with self._lock:
+            self._stop.clear()
+            if self._thread is None:
+                self._reset_replay()
+                self._thread = threading.Thread(target=self._read, args=(asyncio.get_running_loop(),),
+                                                name=f"change-hub-{self.name}", daemon=True)
+                self._thread.start()
+
+    def _detach(self, subscription: Subscription, key: str):
+        subscriptions = self._subscriptions.get(key)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[key]
+        if not self._subscriptions and not self._resuming:
+            self._stop.set()
+
+    def _deliver(self, subscription: Subscription, change: dict):
+        if not subscription.closed and not subscription._put(self.name, self._key_function(change), change):
+            self.dropped += 1
+            subscription._drop()
+
+    def _dispatch(self, change: dict):
+        self.events += 1
+        key = self._key_function(change)
+        self.last_token = change["_id"]["_data"]
+        self._replay.append((self.last_token, key, self._compact_function(change)))
+        for subscription in list(self._subscriptions.get(key, ())) + list(self._subscriptions.get(None, ())):
+            self._deliver(subscription, change)
+
+    def _replay_after(self, subscription: Subscription, key: Optional[str], token: str) -> bool:
+        if self._thread is None:
+            # the changes that happened while the stream was closed are unknown
+            return False
+        if token == self.last_token:
+            return True
+        changes = None
+        for replay_token, replay_key, change in self._replay:
+            if changes is not None and (key is None or replay_key == key):
+                changes.append(change)
+            elif replay_token == token:
+                changes = []
+        if changes is None:
+            return False
+        self.replayed += 1
+        for change in self._restore_function(changes):
+            self._deliver(subscription, change)
+        return True
+
+    def _resume(self, subscription: Subscription, key: Optional[str], token: str):
+        self.resumed += 1
+        self._resuming += 1
+        subscription.tokens[self.name] = token
+        # the shared stream runs meanwhile, so that the dedicated one can hand the subscription over to it
+        self._start()
+        stream = self._resume_function(token)
+        threading.Thread(target=self._read_resumed,
+                         args=(asyncio.get_running_loop(), subscription, key, token, stream),
+                         name=f"change-hub-{self.name}-resumed", daemon=True).start()
+
+    def _read_resumed(self, loop: asyncio.AbstractEventLoop, subscription: Subscription, key: Optional[str],
+                      token: str, stream: Iterator[Optional[dict]]):
+        opened = False
+        # the number of openings of the shared stream before the last read of the dedicated one, if it was open
+        opens = None
+        try:
+            for change in stream:
+                if subscription.closed:
+                    return
+                opened = True
+                if change is not None:
+                    token = change["_id"]["_data"]
+                    if key is None or self._key_function(change) == key:
+                        loop.call_soon_threadsafe(self._deliver, subscription, change)
+                if _call_soon(loop, self._catch_up, subscription, key, token, opens if change is None else None):
+                    return
+                opens = self._opens if self._open else None
+            if opened:
+                # the client reconnects and resumes after the last change it received
+                loop.call_soon_threadsafe(subscription._end)
+            else:
+                # the token cannot be resumed (e.g. it is older than the oplog)
+                loop.call_soon_threadsafe(self._reset, subscription, key)
+        except RuntimeError:
+            # the event loop has been closed, e.g. on shutdown
+            return
+        finally:
+            stream.close()
+            try:
+                loop.call_soon_threadsafe(self._resumed)
+            except RuntimeError:
+                pass
+
+    def _catch_up(self, subscription: Subscription, key: Optional[str], token: str, opens: Optional[int]) -> bool:
+        """
+        Attaches a resumed subscription to the shared stream if the dedicated one has caught up with it, i.e. its
+        last change is in the replay buffer, or it is idle while the shared stream, open since before its last
+        read, has not received any change.
+        """
+        if subscription.closed:
+            return True
+        if token == self.last_token or any(replay_token == token for replay_token, _, _ in self._replay):
+            self.attach(subscription, key, token)
+        elif self.last_token is None and opens is not None and self._open and self._opens == opens:
+            self.attach(subscription, key)
+        else:
+            return False
+        return True
+
+    def _reset(self, subscription: Subscription, key: Optional[str]):
+        if not subscription.closed:
+            subscription._reset(self.name)
+            self.attach(subscription, key)
+
+    def _resumed(self):
+        self._resuming -= 1
+        if not self._subscriptions and not self._resuming:
+            self._stop.set()
+
+    def _reset_replay(self):
+        self._replay.clear()
+        self.last_token = None
+
+    def _stopping(self) -> bool:
+        with self._lock:
+            if self._stop.is_set():
+                self._thread = None
+                return True
+            return False
+
+    def _read(self, loop: asyncio.AbstractEventLoop):
+        while not self._stopping():
+            stream = self._watch_function()
+            try:
+                for change in stream:
+                    if not self._open:
+                        # the stream is open once it yields the first time
+                        self._opens += 1
+                        self._open = True
+                    if change is not None:
+                        try:
+                            loop.call_soon_threadsafe(self._dispatch, change)
+                        except RuntimeError:
+                            # the event loop has been closed, e.g. on shutdown
+                            self._stop.set()
+                            break
+                    elif self._stop.is_set():
+                        break
+            finally:
+                self._open = False
+                stream.close()
+            if not self._stop.is_set():
+                # the stream failed, it is reopened after a while and the changes in between are not replayable
+                loop.call_soon_threadsafe(self._reset_replay)
+                self._stop.wait(CHANGE_HUB_RETRY_SECONDS)
+
+    def stats(self) -> dict:
+        subscriptions = [s for subscriptions in self._subscriptions.values() for s in subscriptions]
+        return {
+            "running": self._thread is not None,
+            "keys": len(self._subscriptions),
+            "subscribers": len(set(subscriptions)),
+            "queue_depths": [s.depth for s in subscriptions],
+            "events": self.events,
+            "dropped": self.dropped,
+            "coalesced": sum(s.coalesced for s in subscriptions),
+            "replay_buffer": len(self._replay),
+            "replayed": self.replayed,
+            "resumed": self.resumed,
+        }
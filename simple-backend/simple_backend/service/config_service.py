@@ -24,7 +24,8 @@ from errors import DagCycleError
 from schemas.nodes import UI, CustomNode, Node, UINode, CustomNodeStructure, NodeStructure
 from service import node_service
 from service.dag_generator import DagCreator
-from service.node_service import parse_custom_node_requirements
+from service.node_service import get_custom_node_requirements
+from service.script_cache import configuration_hash, script_cache
 from service.script_generator import ScriptGenerator
 from service.repository_service import add_dataflow_to_repo
 import config
@@ -42,15 +43,20 @@ def check_dag(nodes):
     dag = DagCreator()
     dag.create_dag(nodes)
     if dag.has_cycles():
-        raise DagCycleError("The Dataflow contains cycles!", 400)
+        raise DagCycleError("The Dataflow contains cycles! Cycle: " + " -> ".join(dag.get_cycle()), 400)
 
     return dag
 
 
 def generate_script(nodes: list[Union[CustomNode, Node]]):
     """
-    Method that generates the final python script
+    Method that generates the final python script.
+    Scripts are memoized by the hash of the nodes, so that an unchanged dataflow skips the generation.
     """
+    key = configuration_hash(nodes)
+    if (script := script_cache.get(key)) is not None:
+        return script
+
     dag = check_dag(nodes)
 
     ordered_nodes = dag.get_ordered_nodes()
@@ -61,10 +67,15 @@ def generate_script(nodes: list[Union[CustomNode, Node]]):
 
     script_generator = ScriptGenerator(ordered_nodes, ordered_edges)
     script = script_generator.generate_script()
+    script_cache.put(key, script)
 
     return script
 
 
+def get_script_cache_stats():
+    return script_cache.stats()
+
+
 def get_requirements(libs: List[str], ui_nodes: List[UINode],
                      ui_structures: dict[str, Union[CustomNodeStructure, NodeStructure]]) -> List[str]:
     """
@@ -86,7 +97,7 @@ def get_requirements(libs: List[str], ui_nodes: List[UINode],
     custom_structures = set([node.package for node in ui_nodes
                              if node.package.startswith('rain.nodes.custom.custom.CustomNode')])
     for structure in custom_structures:
-        for req in parse_custom_node_requirements(ui_structures[structure].code):
+        for req in get_custom_node_requirements(ui_structures[structure].code):
             requirements.add(req)
 
     return requirements
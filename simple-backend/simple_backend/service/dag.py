@@ -0,0 +1,102 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+from typing import Iterable, List, Tuple
+
+
+class Dag:
+    """
+    Directed graph stored as flat integer arrays.
+
+    Node ids are mapped to consecutive integers in order of first appearance in the edges, and the successors of
+    every node are kept in a compressed adjacency array (the successors of the node i are
+    targets[offsets[i]:offsets[i + 1]]), so that sorting the graph only walks lists of integers.
+    """
+
+    def __init__(self, edges: Iterable[Tuple[str, str]]):
+        self.node_ids: List[str] = []
+        index = {}
+        pairs = {}
+        for source, destination in edges:
+            for node_id in (source, destination):
+                if node_id not in index:
+                    index[node_id] = len(self.node_ids)
+                    self.node_ids.append(node_id)
+            pairs[(index[source], index[destination])] = None
+
+        size = len(self.node_ids)
+        self.offsets = [0] * (size + 1)
+        self.in_degrees = [0] * size
+        for source, destination in pairs:
+            self.offsets[source + 1] += 1
+            self.in_degrees[destination] += 1
+        for i in range(size):
+            self.offsets[i + 1] += self.offsets[i]
+
+        self.targets = [0] * len(pairs)
+        fill = self.offsets[:-1]
+        for source, destination in pairs:
+            self.targets[fill[source]] = destination
+            fill[source] += 1
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def sort(self) -> Tuple[List[str], List[str]]:
+        """
+        Method that sorts the nodes with the Kahn algorithm, detecting cycles in the same pass.
+        Returns the topologically ordered node ids and, if the graph is not acyclic, the node ids of one of its
+        cycles (in which case the ordered list only contains the nodes that do not depend on a cycle).
+        """
+        offsets, targets = self.offsets, self.targets
+        in_degrees = self.in_degrees[:]
+        queue = [i for i, degree in enumerate(in_degrees) if degree == 0]
+        for node in queue:
+            for target in targets[offsets[node]:offsets[node + 1]]:
+                in_degrees[target] -= 1
+                if in_degrees[target] == 0:
+                    queue.append(target)
+
+        cycle = self._find_cycle(in_degrees) if len(queue) < len(self.node_ids) else []
+
+        return [self.node_ids[i] for i in queue], [self.node_ids[i] for i in cycle]
+
+    def _find_cycle(self, in_degrees: List[int]) -> List[int]:
+        """
+        Method that returns one cycle among the nodes left unsorted by the Kahn algorithm.
+        Each of these nodes has a predecessor which is unsorted too, so walking back the predecessors must
+        eventually visit a node twice.
+        """
+        offsets, targets = self.offsets, self.targets
+        predecessors = {}
+        for source in range(len(self.node_ids)):
+            if in_degrees[source]:
+                for target in targets[offsets[source]:offsets[source + 1]]:
+                    if in_degrees[target]:
+                        predecessors.setdefault(target, source)
+
+        node = next(iter(predecessors))
+        visited = {}
+        while node not in visited:
+            visited[node] = len(visited)
+            node = predecessors[node]
+
+        walk = list(visited)[visited[node]:]
+        walk.reverse()
+
+        return walk
@@ -19,9 +19,8 @@
 from dataclasses import dataclass
 from typing import List
 
-import networkx as nx
-
 from schemas.nodes import Node
+from service.dag import Dag
 
 
 @dataclass
@@ -48,15 +47,16 @@ class DagCreator:
     """
 
     def __init__(self):
-        self._graph = nx.DiGraph()
         self._is_loaded = False
         self._nodes = {}
-        self._sorted_nodes = None
+        self._sorted_node_ids = None
+        self._cycle = None
         self._edges = None
 
     def create_dag(self, nodes: list):
         self._edges = get_edges(nodes)
-        self._graph.add_edges_from([(edge.source, edge.destination) for edge in self._edges.values()])
+        dag = Dag((edge.source, edge.destination) for edge in self._edges.values())
+        self._sorted_node_ids, self._cycle = dag.sort()
         self._nodes.update({node.node_id: node for node in nodes})
         self._is_loaded = True
 
@@ -73,9 +73,13 @@ class DagCreator:
 
     def get_ordered_node_ids(self) -> List[str]:
         if self._is_loaded:
-            topologically_ordered_list = list(nx.topological_sort(self._graph))
-
-            return topologically_ordered_list
+            return list(self._sorted_node_ids)
 
     def has_cycles(self):
-        return not nx.is_directed_acyclic_graph(self._graph)
+        return bool(self._cycle)
+
+    def get_cycle(self) -> List[str]:
+        """
+        Returns the ids of the nodes of a cycle of the dag, or an empty list if the dag is acyclic.
+        """
+        return list(self._cycle or [])
@@ -0,0 +1,73 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+from typing import Dict, List, NamedTuple
+from service.database_service import DatabaseService, get_database
+from service.log_storage import EXECUTION_LOGS_COLLECTION_ID
+from service.script_cache import SCRIPT_CACHE_SHARED, SCRIPT_CACHE_TTL_SECONDS, SCRIPTS_CACHE_COLLECTION_ID
+
+EXECUTIONS_COLLECTION_ID = 'executions'
+REPOSITORIES_COLLECTION_ID = 'repositories'
+USERS_COLLECTION_ID = 'users'
+
+
+class Index(NamedTuple):
+    keys: List[tuple]
+    options: dict = {}
+
+
+# the indexes of each collection, next to the queries they serve
+INDEXES: Dict[str, List[Index]] = {
+    EXECUTIONS_COLLECTION_ID: [
+        # get_all_executions_status, paginated by created_at and _id
+        Index([("issuer", 1), ("created_at", 1), ("_id", 1)]),
+        # get_execution_durations
+        Index([("pipeline_uid", 1), ("status", 1), ("created_at", -1)]),
+    ],
+    EXECUTION_LOGS_COLLECTION_ID: [
+        # get_log_chunks, get_log_tail and delete_logs
+        Index([("execution_id", 1), ("seq", 1)], {"unique": True}),
+    ],
+    REPOSITORIES_COLLECTION_ID: [
+        # get_repositories_names, with archived as prefix so that each clause of the $or is an index scan, and
+        # get_archived_repositories_names, paginated by _id
+        Index([("archived", 1), ("users", 1), ("_id", 1)]),
+        # add_dataflow_to_repo
+        Index([("name", 1)]),
+    ],
+    USERS_COLLECTION_ID: [
+        # get_current_user and login, on every authenticated request
+        Index([("username", 1)]),
+    ],
+}
+
+if SCRIPT_CACHE_SHARED:
+    # the shared scripts expire with the ttl of the cache
+    INDEXES[SCRIPTS_CACHE_COLLECTION_ID] = [
+        Index([("created_at", 1)], {"expireAfterSeconds": SCRIPT_CACHE_TTL_SECONDS}),
+    ]
+
+
+def ensure_indexes(db: DatabaseService = None):
+    """
+    Method that creates the declared indexes, it is run at startup and does nothing for the existing ones
+    """
+    db = db or get_database()
+    for collection_id, indexes in INDEXES.items():
+        for index in indexes:
+            db.create_index(collection_id, index.keys, **index.options)
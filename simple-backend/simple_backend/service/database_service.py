@@ -1,4 +1,15 @@
 import os
+from typing import NamedTuple
+
+
+class WriteResult(NamedTuple):
+    """
+    Number of documents matched and modified by a write operation.
+    Write operations raise the errors of the database, so a missing document is told apart by matched being 0.
+    """
+    matched: int
+    modified: int
+
 
 def get_database():
     db_type = os.environ.get("DATABASE_TYPE", "MONGODB")
@@ -12,12 +23,28 @@ class DatabaseService:
         pass
 
 
+    def upsert_document(self, collection_id: str, document: dict):
+        pass
+
+
     def get_document(self, collection_id: str, filter: dict, projection: dict = {}):
         pass
 
 
+    def get_documents(self, collection_id: str, filter: dict, projection: dict = None, sort: list = None, limit: int = 0):
+        pass
+
+
     def delete_document(self, collection_id: str, document_id: str):
         pass
+
+
+    def delete_documents(self, collection_id: str, filter: dict):
+        pass
+
+
+    def create_index(self, collection_id: str, keys: list, **options):
+        pass
             
 
     def get_document_field(self, collection_id: str, document_id: str, field_name: str):
@@ -28,6 +55,10 @@ class DatabaseService:
         pass
 
 
+    def set_document_fields(self, collection_id: str, document_id: str, fields: dict):
+        pass
+
+
     def push_document_array_field(self, collection_id: str,document_id: str, field_name: str, field_value: str):
         pass
         
@@ -36,9 +67,11 @@ class DatabaseService:
         pass
 
 
-    def watch_document(self, collection_id: str, update_function):
+    def iter_documents_fields(self, collection_id: str, projection: dict, filter: dict = {}, limit: int = 0,
+                              after: str = None, sort_field: str = "_id", descending: bool = False):
         pass
 
 
-    def watch_documents(self, collection_id: str, update_function):
-        pass
\ No newline at end of file
+    def watch_changes(self, collection_id: str, operation_type: str, fields: list = None, document_id: str = None,
+                      document_filter: dict = None, resume_after: str = None, max_await_time_ms: int = 1000):
+        pass
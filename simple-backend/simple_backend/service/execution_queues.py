@@ -0,0 +1,88 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import os
+from statistics import median
+from typing import Callable, List, Optional, Tuple
+from kombu import Queue
+from errors import BadRequestError
+from service.venv_cache import normalize_requirements
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+HEAVY = "heavy"
+
+# default priority of the executions of each queue, 9 being the highest
+QUEUE_PRIORITIES = {INTERACTIVE: 9, BATCH: 5, HEAVY: 1}
+MAX_PRIORITY = 9
+
+EXECUTION_DEFAULT_QUEUE = os.environ.get("EXECUTION_DEFAULT_QUEUE", BATCH)
+EXECUTION_INTERACTIVE_SECONDS = float(os.environ.get("EXECUTION_INTERACTIVE_SECONDS", "60"))
+EXECUTION_HEAVY_SECONDS = float(os.environ.get("EXECUTION_HEAVY_SECONDS", "1800"))
+EXECUTION_HISTORY_SIZE = int(os.environ.get("EXECUTION_HISTORY_SIZE", "5"))
+EXECUTION_HEAVY_REQUIREMENTS = os.environ.get(
+    "EXECUTION_HEAVY_REQUIREMENTS", "tensorflow,torch,keras,xgboost,lightgbm,pyspark,transformers").split(",")
+
+task_queues = [Queue(name, routing_key=name, queue_arguments={"x-max-priority": MAX_PRIORITY})
+               for name in QUEUE_PRIORITIES]
+
+
+def requirement_name(requirement: str) -> str:
+    """
+    Returns the lowercase package name of a requirement line, e.g. 'torch' for 'torch[cuda]>=2.0'
+    """
+    for i, c in enumerate(requirement):
+        if not (c.isalnum() or c in "-_."):
+            requirement = requirement[:i]
+            break
+    return requirement.strip().lower().replace("_", "-")
+
+
+def infer_execution_queue(requirements: str, durations: List[float]) -> str:
+    """
+    Method that chooses the queue of an execution.
+    Dataflows needing a heavy package go to the heavy queue; otherwise the median duration of their last
+    executions decides, and dataflows never executed go to the default queue.
+    """
+    heavy = {name.strip().lower().replace("_", "-") for name in EXECUTION_HEAVY_REQUIREMENTS if name.strip()}
+    if any(requirement_name(requirement) in heavy for requirement in normalize_requirements(requirements)):
+        return HEAVY
+    if not durations:
+        return EXECUTION_DEFAULT_QUEUE
+    duration = median(durations)
+    if duration <= EXECUTION_INTERACTIVE_SECONDS:
+        return INTERACTIVE
+    if duration >= EXECUTION_HEAVY_SECONDS:
+        return HEAVY
+    return BATCH
+
+
+def route_execution(requirements: str, queue: Optional[str], priority: Optional[int],
+                    history_function: Callable[[], List[float]]) -> Tuple[str, int]:
+    """
+    Returns the queue and the priority of an execution, inferring the ones that are not given.
+    The history function returns the durations of the last executions of the dataflow, and it is only called
+    when the queue has to be inferred.
+    """
+    if queue is None:
+        queue = infer_execution_queue(requirements, history_function())
+    elif queue not in QUEUE_PRIORITIES:
+        raise BadRequestError(f"Unknown queue {queue}, available queues: {', '.join(QUEUE_PRIORITIES)}")
+    if priority is None:
+        priority = QUEUE_PRIORITIES[queue]
+    return queue, priority
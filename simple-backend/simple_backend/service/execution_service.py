@@ -19,17 +19,30 @@
 import uuid
 import os
 import subprocess
+import threading
+import time
 from json import loads, dumps
+from functools import partial
+from typing import List
 from datetime import datetime
 import randomname
 from celery import Celery
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
 from celery.contrib.abortable import AbortableTask
-from virtualenv import cli_run
 import shutil
-from errors import BadRequestError
 from schemas.nodes import ConfigurationSchema
+from service.change_hub import ChangeStreamHub, Subscription, parse_event_id
 from service.database_service import get_database
 from service.config_service import generate_script
+from service.log_buffer import LogBuffer
+from service.execution_queues import EXECUTION_DEFAULT_QUEUE, EXECUTION_HISTORY_SIZE, MAX_PRIORITY, QUEUE_PRIORITIES, \
+    route_execution, task_queues
+from service.output_reader import STDOUT, OutputReader
+from service.sandbox import ExecutionLimits, SandboxedProcess
+from service.log_storage import EXECUTION_LOGS_COLLECTION_ID, LOG_PAGE_CHUNKS, LOG_TAIL_CHUNKS, LogChunkWriter, delete_logs, \
+    get_log_chunks, get_log_tail, compact_log_change, restore_log_changes
+from service.venv_cache import venv_cache, get_venv_executable
+from service.warm_pool import warm_pool
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -42,13 +55,92 @@ REVOKED = "Revoked"
 DATABASE_NAME='rainfall'
 EXECUTIONS_COLLECTION_ID='executions'
 WORKER_EXECUTION_PATH='/tmp/execution'
+ABORT_WATCH_AWAIT_MS = int(os.environ.get("ABORT_WATCH_AWAIT_MS", "200"))
 
 celery = Celery(__name__)
 celery.conf.broker_url = os.environ.get("BROKER_URL")
 celery.conf.result_backend = os.environ.get("MONGODB_URL")
+# executions are long and uneven, so a worker process reserves one task at a time, leaving the queued ones to the
+# processes that are free. Tasks are acknowledged when they start: executions are not idempotent and may outlast the
+# consumer timeout of the broker, so they must not be redelivered
+celery.conf.worker_prefetch_multiplier = int(os.environ.get("WORKER_PREFETCH_MULTIPLIER", "1"))
+if os.environ.get("WORKER_CONCURRENCY"):
+    celery.conf.worker_concurrency = int(os.environ.get("WORKER_CONCURRENCY"))
+# executions are routed to the interactive, batch and heavy queues, workers choose which ones to consume with -Q
+celery.conf.task_queues = task_queues
+celery.conf.task_default_queue = EXECUTION_DEFAULT_QUEUE
+celery.conf.task_queue_max_priority = MAX_PRIORITY
+celery.conf.task_default_priority = QUEUE_PRIORITIES[EXECUTION_DEFAULT_QUEUE]
 db = get_database()
 
 
+class AbortWatcher:
+    """
+    Watches the status of an execution through a change stream and calls the abort function as soon as it is
+    revoked, so that the worker does not have to poll the result backend.
+    If the change stream cannot be opened (e.g. without a replica set) failed is set, and the caller falls back to
+    polling.
+    """
+
+    def __init__(self, execution_id: str, abort_function):
+        self.execution_id = execution_id
+        self.aborted = threading.Event()
+        self.failed = False
+        self._abort_function = abort_function
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name=f"abort-{execution_id}", daemon=True)
+
+    def _watch(self):
+        changes = db.watch_changes(EXECUTIONS_COLLECTION_ID, 'update', ['status'], document_id=self.execution_id,
+                                   max_await_time_ms=ABORT_WATCH_AWAIT_MS)
+        try:
+            for i, change in enumerate(changes):
+                if self._stopped.is_set():
+                    return
+                # the stream is open once it yields the first time, a revocation before that is read once
+                if i == 0 and get_execution_field(self.execution_id, 'status') == REVOKED:
+                    self._abort()
+                elif change is not None and change["updateDescription"]["updatedFields"].get('status') == REVOKED:
+                    self._abort()
+            self.failed = not self._stopped.is_set()
+        finally:
+            changes.close()
+
+    def _abort(self):
+        if not self.aborted.is_set():
+            self.aborted.set()
+            self._abort_function()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stopped.set()
+
+
+@worker_init.connect
+def build_base_venv(**kwargs):
+    # built once by the main process before the pool starts, so that executions only take its shared lock
+    venv_cache.base_venv()
+
+
+@worker_process_init.connect
+def start_warm_pool(**kwargs):
+    def fill():
+        base_venv_loc = venv_cache.base_venv()
+        if base_venv_loc:
+            warm_pool.fill(get_venv_executable(base_venv_loc, "python"))
+
+    # the base is already built by the main process, unless that failed and it is built again here
+    threading.Thread(target=fill, daemon=True).start()
+
+
+@worker_process_shutdown.connect
+def stop_warm_pool(**kwargs):
+    warm_pool.close()
+
+
 @celery.task(name="execute_dataflow", ignore_result=True, bind=True, base=AbortableTask)
 def execute_dataflow(self, execution_id: str, execution_issuer: str):
     def cleanup(path: str):
@@ -57,7 +149,8 @@ def execute_dataflow(self, execution_id: str, execution_issuer: str):
 
     execution = get_execution_instance(execution_id)
     if execution:
-        set_execution_field(execution_id, 'status', RUNNING)
+        set_execution_fields(execution_id, {'status': RUNNING, 'started_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+        started = time.monotonic()
         path = WORKER_EXECUTION_PATH + str(execution_id) + '/'
 
         if not os.path.isdir(path):
@@ -70,48 +163,78 @@ def execute_dataflow(self, execution_id: str, execution_issuer: str):
             ui.write(execution['ui'])
 
         venv_loc = os.path.join(path, "venv")
-        cli_run([venv_loc])
-
-        if str(os.name).lower() == "nt":
-            venv_scripts_loc = "Scripts"
-        elif str(os.name).lower() == "posix":
-            venv_scripts_loc = "bin"
-        else:
-            raise BadRequestError("unsupported OS")
-        
-        if self.is_aborted():
-            cleanup(path)
-            return 'Task aborted'
-
-        os.chdir(path)
-        pip_loc = os.path.join(venv_loc, venv_scripts_loc, 'pip')
-        os.system(pip_loc + " install --upgrade pip")
-        os.system(pip_loc + " install -r requirements.txt")
-
-        if self.is_aborted():
-            cleanup(path)
-            return 'Task aborted'
-
-        cmd = [os.path.join(venv_loc, venv_scripts_loc, "python"), "script.py", execution_issuer]
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, cwd=path, universal_newlines=True, bufsize=1, text=True)
-
-        while True:
+        with venv_cache.acquire_layered(execution['requirements']) as cached_venv_loc:
+            os.symlink(cached_venv_loc, venv_loc, target_is_directory=True)
+
             if self.is_aborted():
                 cleanup(path)
                 return 'Task aborted'
-            line = process.stdout.readline()
-            if line == '' and process.poll() is not None:
-                break
-            status = line.strip().split('|')[1]
-            update_execution_field(execution_id, 'logs', line.strip())
 
-        if status == 'SUCCESS':
-            set_execution_field(execution_id, 'status', SUCCESS)
-        else:
-            set_execution_field(execution_id, 'status', ERROR)
+            python = get_venv_executable(cached_venv_loc, "python")
+            cmd = [python, "script.py", execution_issuer]
+            # the queue the task was delivered from, the one stored by submit_execution may not be written yet
+            queue = (self.request.delivery_info or {}).get('routing_key')
+            sandbox = SandboxedProcess(cmd, path, ExecutionLimits.for_queue(queue),
+                                       process=warm_pool.take(python, path, cmd[1:]),
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            log_buffer = LogBuffer(LogChunkWriter(execution_id))
+            status = None
+
+            def add_lines(stream: str, lines: List[str]):
+                nonlocal status
+                lines = [line.strip() for line in lines]
+                # the status is the level of the last line logged by rain, the output of stderr is kept as is
+                if stream == STDOUT:
+                    for line in lines:
+                        if '|' in line:
+                            status = line.split('|')[1]
+                log_buffer.extend(lines)
+
+            try:
+                with sandbox, AbortWatcher(execution_id, lambda: sandbox.kill(grace_seconds=0)) as abort_watcher:
+                    completed = OutputReader(
+                        sandbox.process, add_lines,
+                        lambda: abort_watcher.aborted.is_set() or (abort_watcher.failed and self.is_aborted())).read()
+                if not completed or abort_watcher.aborted.is_set():
+                    cleanup(path)
+                    return 'Task aborted'
+                if sandbox.timed_out:
+                    status = 'TIMEOUT'
+                    log_buffer.append(f"Execution killed after {sandbox.limits.timeout_seconds:g} seconds")
+            finally:
+                log_buffer.close()
+                set_execution_field(execution_id, 'log_stats', log_buffer.stats)
+
+        set_execution_fields(execution_id, {
+            'status': SUCCESS if status == 'SUCCESS' else ERROR,
+            'duration': round(time.monotonic() - started, 3),
+            'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        })
 
         cleanup(path)
-        process.wait()
+
+
+def submit_execution(execution_id: str, user_id: str, queue: str = None, priority: int = None):
+    """
+    Method that sends the execution to the queue given or inferred from its requirements and history
+    """
+    execution = get_execution_instance(execution_id)
+    queue, priority = route_execution(execution['requirements'], queue, priority,
+                                      lambda: get_execution_durations(execution.get('pipeline_uid')))
+    task_id = execute_dataflow.apply_async((execution_id, user_id), queue=queue, priority=priority)
+    set_execution_fields(execution_id, {'queue': queue, 'priority': priority, 'celery_task_id': str(task_id)})
+    return task_id
+
+
+def get_execution_durations(pipeline_uid: str):
+    """
+    Returns the durations of the last successful executions of a dataflow
+    """
+    if not pipeline_uid:
+        return []
+    executions = db.get_documents(EXECUTIONS_COLLECTION_ID, {"pipeline_uid": pipeline_uid, "status": SUCCESS},
+                                  {"duration": 1}, sort=[("created_at", -1)], limit=EXECUTION_HISTORY_SIZE) or []
+    return [execution["duration"] for execution in executions if "duration" in execution]
 
 
 def revoke_execution(execution_id: str):
@@ -133,8 +256,8 @@ def create_execution_instance(config, user_id):
         "name": execution_name,
         "created_at": current_time,
         "issuer": user_id,
+        "pipeline_uid": config.pipeline_uid,
         "status": PENDING,
-        "logs": list(),
         "script": script,
         "requirements": "\n".join(config.dependencies),
         "ui": config.ui.json(separators=(',', ':')),
@@ -148,6 +271,7 @@ def get_execution_instance(execution_id: str):
 
 
 def delete_execution_instance(execution_id: str):
+    delete_logs(execution_id)
     return db.delete_document(EXECUTIONS_COLLECTION_ID, execution_id)
 
 
@@ -156,39 +280,81 @@ def get_execution_field(execution_id: str, field_name: str):
 
 
 def set_execution_field(execution_id: str, field_name: str, field_value: str):
-    db.set_document_field(EXECUTIONS_COLLECTION_ID, execution_id, field_name, field_value)
-
-
-def update_execution_field(execution_id: str, field_name: str, field_value: str):
-    db.push_document_array_field(EXECUTIONS_COLLECTION_ID, execution_id, field_name, field_value)
-
-
-def get_all_executions_status(user):
-    return db.get_all_documents_fields(EXECUTIONS_COLLECTION_ID, {"_id": 1, "status": 1, "name": 1, "issuer": 1}, {"issuer": user["_id"]})
-
-
-def watch_execution(execution_id: str):
-    def update_function(item_update):
-        if 'status' in item_update:
-            if item_update['status'] != 'Running':
-                data = {"id": execution_id, "status": item_update['status']}
-                event_data = f"data: {dumps(data)}\n"
-                return event_data
-        else:
-            logs_values = [value for key, value in item_update.items() if "logs" in key]
-            data = {"id": execution_id, "logs": logs_values[0]}
-            event_data = f"{dumps(data)}"
-            return event_data
-
-    return db.watch_document(EXECUTIONS_COLLECTION_ID, update_function)
-
-
-def watch_executions():
-    def update_function(item_update, pipeline_id):
-        updated_status = item_update.get('status')
-        if updated_status is not None:
-            data = {"id": pipeline_id, "status": updated_status}
-            event_data = f"{dumps(data)}"
-            return event_data
-
-    return db.watch_documents(EXECUTIONS_COLLECTION_ID, update_function)
+    return db.set_document_field(EXECUTIONS_COLLECTION_ID, execution_id, field_name, field_value)
+
+
+def set_execution_fields(execution_id: str, fields: dict):
+    return db.set_document_fields(EXECUTIONS_COLLECTION_ID, execution_id, fields)
+
+
+def get_execution_log_chunks(execution_id: str, from_seq: int = 0, limit: int = LOG_PAGE_CHUNKS):
+    return get_log_chunks(execution_id, from_seq, limit)
+
+
+def get_execution_log_tail(execution_id: str, chunks: int = LOG_TAIL_CHUNKS):
+    return get_log_tail(execution_id, chunks)
+
+
+def get_all_executions_status(user, limit: int = 0, after: str = None):
+    """
+    Yields the executions of the user in order of creation, up to limit and starting after the given execution id
+    """
+    return db.iter_documents_fields(EXECUTIONS_COLLECTION_ID, {"_id": 1, "status": 1, "name": 1, "issuer": 1},
+                                    {"issuer": user["_id"]}, limit=limit, after=after, sort_field="created_at")
+
+
+executions_hub = ChangeStreamHub(
+    EXECUTIONS_COLLECTION_ID,
+    partial(db.watch_changes, EXECUTIONS_COLLECTION_ID, 'update', ['status']),
+    lambda change: change["documentKey"]["_id"],
+    lambda token: db.watch_changes(EXECUTIONS_COLLECTION_ID, 'update', ['status'], resume_after=token))
+execution_logs_hub = ChangeStreamHub(
+    EXECUTION_LOGS_COLLECTION_ID,
+    partial(db.watch_changes, EXECUTION_LOGS_COLLECTION_ID, 'insert'),
+    lambda change: change["fullDocument"]["execution_id"],
+    lambda token: db.watch_changes(EXECUTION_LOGS_COLLECTION_ID, 'insert', resume_after=token),
+    # the chunks can be large, only their ids are kept for the replay
+    compact_log_change, restore_log_changes)
+
+
+def get_watch_stats():
+    return {hub.name: hub.stats() for hub in (executions_hub, execution_logs_hub)}
+
+
+async def watch_execution(execution_id: str, last_event_id: str = None):
+    tokens = parse_event_id(last_event_id)
+    subscription = Subscription()
+    executions_hub.attach(subscription, execution_id, tokens.get(executions_hub.name))
+    execution_logs_hub.attach(subscription, execution_id, tokens.get(execution_logs_hub.name))
+    try:
+        async for change in subscription:
+            if change is None:
+                # the missed changes are lost, the client reloads the execution
+                yield {"id": subscription.event_id, "event": "reset", "data": dumps({"id": execution_id})}
+            elif change["ns"]["coll"] == EXECUTION_LOGS_COLLECTION_ID:
+                chunk = change["fullDocument"]
+                data = {"id": execution_id, "seq": chunk["seq"], "logs": chunk["lines"]}
+                yield {"id": subscription.event_id, "data": dumps(data)}
+            else:
+                item_update = change["updateDescription"]["updatedFields"]
+                if item_update['status'] != 'Running':
+                    data = {"id": execution_id, "status": item_update['status']}
+                    yield {"id": subscription.event_id, "data": f"data: {dumps(data)}\n"}
+    finally:
+        subscription.close()
+
+
+async def watch_executions(last_event_id: str = None):
+    tokens = parse_event_id(last_event_id)
+    subscription = Subscription(coalesce=True)
+    executions_hub.attach(subscription, resume_after=tokens.get(executions_hub.name))
+    try:
+        async for change in subscription:
+            if change is None:
+                # the missed changes are lost, the client reloads the executions
+                yield {"id": subscription.event_id, "event": "reset", "data": dumps({})}
+                continue
+            data = {"id": str(change["documentKey"]["_id"]), "status": change["updateDescription"]["updatedFields"]['status']}
+            yield {"id": subscription.event_id, "data": dumps(data)}
+    finally:
+        subscription.close()
@@ -0,0 +1,108 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import os
+from typing import Callable, Dict, List, Tuple
+from errors import BadRequestError
+from service.dag import Dag
+
+LAYER_SPACING = 300
+NODE_SPACING = 150
+SPRING_LAYOUT_SCALE = 500
+SPRING_LAYOUT_MAX_ITERATIONS = int(os.environ.get("SPRING_LAYOUT_MAX_ITERATIONS", "200"))
+
+Positions = Dict[str, List[float]]
+
+
+def layered_layout(nodes: List[str], edges: List[Tuple[str, str]], **kwargs) -> Positions:
+    """
+    Method that places the nodes in layers from left to right, as in the Sugiyama layout.
+    Each node goes in the layer after its farthest predecessor, and the nodes of a layer are ordered by the mean
+    position of their predecessors, to reduce the crossing edges. The result only depends on the order of the
+    nodes and of the edges, so the same script always gets the same positions.
+    """
+    dag = Dag(edges)
+    ordered, _ = dag.sort()
+
+    predecessors = {node: [] for node in dag.node_ids}
+    for source, node in enumerate(dag.node_ids):
+        for target in dag.targets[dag.offsets[source]:dag.offsets[source + 1]]:
+            if target != source:
+                predecessors[dag.node_ids[target]].append(node)
+
+    layer = {}
+    for node in ordered:
+        layer[node] = max((layer[p] + 1 for p in predecessors[node]), default=0)
+    # nodes without edges go in the first layer, and the ones depending on a cycle after all the others
+    last = max(layer.values(), default=-1) + 1
+    for node in nodes:
+        if node not in layer:
+            layer[node] = last if node in predecessors else 0
+
+    layers: List[List[str]] = [[] for _ in range(max((layer[node] for node in nodes), default=-1) + 1)]
+    for node in nodes:
+        layers[layer[node]].append(node)
+
+    slot = {}
+    for nodes_in_layer in layers:
+        keys = {}
+        for position, node in enumerate(nodes_in_layer):
+            slots = [slot[p] for p in predecessors.get(node, []) if p in slot]
+            keys[node] = sum(slots) / len(slots) if slots else position
+        nodes_in_layer.sort(key=keys.__getitem__)
+        slot.update({node: position for position, node in enumerate(nodes_in_layer)})
+
+    height = max((len(nodes_in_layer) for nodes_in_layer in layers), default=0)
+    positions = {}
+    for x, nodes_in_layer in enumerate(layers):
+        offset = (height - len(nodes_in_layer)) * NODE_SPACING / 2
+        for y, node in enumerate(nodes_in_layer):
+            positions[node] = [float(x * LAYER_SPACING), float(offset + y * NODE_SPACING)]
+
+    return positions
+
+
+def spring_layout(nodes: List[str], edges: List[Tuple[str, str]], iterations: int = 50, **kwargs) -> Positions:
+    """
+    Method that places the nodes with the force-directed layout of networkx.
+    Each iteration is quadratic in the number of nodes, so the iterations are capped, and the seed is fixed so
+    that the same script always gets the same positions.
+    """
+    import networkx as nx
+
+    g = nx.DiGraph()
+    g.add_nodes_from(nodes)
+    g.add_edges_from(edges)
+    scale = SPRING_LAYOUT_SCALE
+    pos = nx.spring_layout(g, scale=scale, iterations=min(iterations, SPRING_LAYOUT_MAX_ITERATIONS), seed=0)
+    return {n: [float(pos[n][0]) + scale, float(pos[n][1]) + scale] for n in pos}
+
+
+LAYOUTS: Dict[str, Callable[..., Positions]] = {
+    "layered": layered_layout,
+    "spring": spring_layout,
+}
+
+
+def compute_layout(layout: str, nodes: List[str], edges: List[Tuple[str, str]], **kwargs) -> Positions:
+    """
+    Returns the positions of the nodes computed by the layout with the given name
+    """
+    if layout not in LAYOUTS:
+        raise BadRequestError(f"Unknown layout {layout}, available layouts: {', '.join(LAYOUTS)}")
+    return LAYOUTS[layout](nodes, edges, **kwargs)
@@ -0,0 +1,93 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import os
+import threading
+from typing import Callable, List
+
+LOG_BUFFER_MAX_LINES = int(os.environ.get("LOG_BUFFER_MAX_LINES", "200"))
+LOG_BUFFER_MAX_BYTES = int(os.environ.get("LOG_BUFFER_MAX_BYTES", str(1024 * 1024)))
+LOG_BUFFER_MAX_DELAY_MS = int(os.environ.get("LOG_BUFFER_MAX_DELAY_MS", "500"))
+
+
+class LogBuffer:
+    """
+    Collects the log lines of an execution and hands them to the flush function in batches.
+
+    The buffer is flushed as soon as it holds max_lines lines or max_bytes bytes, or its oldest line has been
+    waiting for max_delay_ms milliseconds, whichever comes first, and once more when it is closed.
+    The counters of lines, flushes and bytes are available through stats, to tune the two thresholds.
+    """
+
+    def __init__(self, flush_function: Callable[[List[str]], None], max_lines: int = LOG_BUFFER_MAX_LINES,
+                 max_bytes: int = LOG_BUFFER_MAX_BYTES, max_delay_ms: int = LOG_BUFFER_MAX_DELAY_MS):
+        self._flush_function = flush_function
+        self._max_lines = max_lines
+        self._max_bytes = max_bytes
+        self._max_delay = max_delay_ms / 1000
+        self._lines = []
+        self._size = 0
+        self._lock = threading.RLock()
+        self._timer = None
+        self._stats = {"lines": 0, "flushes": 0, "bytes": 0}
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def append(self, line: str):
+        with self._lock:
+            size = len(line.encode('utf-8'))
+            if self._lines and self._size + size > self._max_bytes:
+                self.flush()
+            self._lines.append(line)
+            self._size += size
+            self._stats["lines"] += 1
+            self._stats["bytes"] += size
+            if len(self._lines) >= self._max_lines or self._size >= self._max_bytes:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self._max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def extend(self, lines: List[str]):
+        with self._lock:
+            for line in lines:
+                self.append(line)
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._lines:
+                return
+            lines, self._lines, self._size = self._lines, [], 0
+            self._flush_function(lines)
+            self._stats["flushes"] += 1
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,93 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import os
+from datetime import datetime
+from typing import List
+from service.database_service import get_database
+
+EXECUTION_LOGS_COLLECTION_ID = 'execution_logs'
+LOG_TAIL_CHUNKS = int(os.environ.get("LOG_TAIL_CHUNKS", "5"))
+LOG_PAGE_CHUNKS = int(os.environ.get("LOG_PAGE_CHUNKS", "20"))
+LOG_PAGE_MAX_CHUNKS = int(os.environ.get("LOG_PAGE_MAX_CHUNKS", "200"))
+CHUNK_PROJECTION = {"_id": 0, "seq": 1, "lines": 1}
+db = get_database()
+
+
+class LogChunkWriter:
+    """
+    Stores the log lines of an execution as a sequence of chunk documents, one for each batch flushed by a
+    LogBuffer, which bounds the number of lines and bytes of a chunk.
+    Chunks are identified by the execution id and their sequence number, starting from 0.
+    """
+
+    def __init__(self, execution_id: str, seq: int = 0):
+        self._execution_id = execution_id
+        self._seq = seq
+
+    def __call__(self, lines: List[str]):
+        db.create_document(EXECUTION_LOGS_COLLECTION_ID, {
+            "_id": f"{self._execution_id}:{self._seq}",
+            "execution_id": self._execution_id,
+            "seq": self._seq,
+            "lines": lines,
+            "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        self._seq += 1
+
+
+def get_log_chunks(execution_id: str, from_seq: int = 0, limit: int = LOG_PAGE_CHUNKS) -> List[dict]:
+    """
+    Returns up to limit chunks of an execution starting from the given sequence number, in order
+    """
+    return db.get_documents(EXECUTION_LOGS_COLLECTION_ID, {"execution_id": execution_id, "seq": {"$gte": from_seq}},
+                            CHUNK_PROJECTION, sort=[("seq", 1)], limit=limit) or []
+
+
+def get_log_tail(execution_id: str, chunks: int = LOG_TAIL_CHUNKS) -> List[dict]:
+    """
+    Returns the last chunks of an execution, in order
+    """
+    tail = db.get_documents(EXECUTION_LOGS_COLLECTION_ID, {"execution_id": execution_id},
+                            CHUNK_PROJECTION, sort=[("seq", -1)], limit=chunks) or []
+    return tail[::-1]
+
+
+def compact_log_change(change: dict) -> dict:
+    """
+    Returns the insert change of a chunk without its lines, which restore_log_changes reads again
+    """
+    chunk = change["fullDocument"]
+    return {**change, "fullDocument": {"_id": chunk["_id"], "execution_id": chunk["execution_id"], "seq": chunk["seq"]}}
+
+
+def restore_log_changes(changes: List[dict]) -> List[dict]:
+    """
+    Returns the changes compacted by compact_log_change with their chunks read from the database, in a single
+    query. The changes of the chunks deleted in the meantime are left out.
+    """
+    if not changes:
+        return []
+    ids = [change["fullDocument"]["_id"] for change in changes]
+    chunks = {chunk["_id"]: chunk for chunk in db.get_documents(EXECUTION_LOGS_COLLECTION_ID, {"_id": {"$in": ids}}) or []}
+    return [{**change, "fullDocument": chunks[change["fullDocument"]["_id"]]}
+            for change in changes if change["fullDocument"]["_id"] in chunks]
+
+
+def delete_logs(execution_id: str):
+    db.delete_documents(EXECUTION_LOGS_COLLECTION_ID, {"execution_id": execution_id})
@@ -17,24 +17,77 @@
  """
 
 import ast
+import gzip
+import hashlib
+import json
 import re
-import sys
 import os
-from typing import List, Optional
-import requests
-from errors import CustomNodeConfigurationError, NodesRetrievalError
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Callable, FrozenSet, List, Mapping, NamedTuple, Optional, Tuple, Union
+from fastapi.encoders import jsonable_encoder
+from errors import CustomNodeConfigurationError
 from schemas.nodes import CustomNode, NodeStructure, CustomNodeIOParams
+from service.structure_loader import StructureLoader
 
 RAIN_STRUCTURE_URL=os.getenv('RAIN_STRUCTURE_URL', 'https://firebasestorage.googleapis.com/v0/b/rainfall-e8e57.appspot.com/o/rain_structure.json?alt=media')
+CUSTOM_NODE_CACHE_SIZE = int(os.environ.get("CUSTOM_NODE_CACHE_SIZE", "1024"))
 
-try:
-    nodes_request = requests.get(url=RAIN_STRUCTURE_URL)
-    if nodes_request.status_code != 200:
-        raise NodesRetrievalError(f"Nodes request failed: {nodes_request.reason}")
-    rain_structure = nodes_request.json()
-except:
-    print('Download of rain_structure.json failed!')
-    sys.exit(1)
+
+class NodesCatalog(NamedTuple):
+    """
+    The list of the Rain nodes as served by the nodes api, serialized once per structure version.
+    """
+    body: bytes
+    gzip_body: bytes
+    etag: str
+
+
+class NodesIndex(NamedTuple):
+    """
+    Read-only lookup tables of the Rain nodes, by clazz and by (clazz, parameter name), and their catalog.
+    """
+    nodes: Mapping[str, dict]
+    params: Mapping[Tuple[str, str], dict]
+    catalog: NodesCatalog
+
+
+def build_nodes_catalog(nodes: list) -> NodesCatalog:
+    """
+    Method that validates and serializes the nodes as the response model of the nodes api would do.
+    The ETag is a hash of the uncompressed body, so it only changes with the served content.
+    """
+    content = jsonable_encoder([NodeStructure.parse_obj(node) for node in nodes])
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return NodesCatalog(body, gzip.compress(body, mtime=0), etag)
+
+
+def build_nodes_index(structure: dict) -> NodesIndex:
+    """
+    Method that indexes the nodes of the Rain structure.
+    When a clazz or a parameter name is repeated, the first occurrence is kept, as done by the previous scans.
+    """
+    nodes = {}
+    params = {}
+    for node in structure["nodes"]:
+        if node["clazz"] in nodes:
+            continue
+        nodes[node["clazz"]] = node
+        for param in node.get("parameter", []):
+            params.setdefault((node["clazz"], param["name"]), param)
+    return NodesIndex(MappingProxyType(nodes), MappingProxyType(params), build_nodes_catalog(structure["nodes"]))
+
+
+structure_loader = StructureLoader(RAIN_STRUCTURE_URL, build_nodes_index)
+
+
+def get_nodes_index() -> NodesIndex:
+    """
+    Returns the index of the currently loaded Rain structure
+    """
+    return structure_loader.snapshot().index
 
 
 def determine_value_type(v: any):
@@ -47,13 +100,11 @@ def determine_value_type(v: any):
     return t
 
 
-def get_node_param_value_and_type(clazz: str, param: str, value: str):
+def get_node_param_value_and_type(clazz: str, param: str, value: Union[str, ast.expr]):
     v = ast.literal_eval(value)
     if clazz == 'CustomNode':
         return v, determine_value_type(v)
-    n = [x for x in rain_structure["nodes"] if x["clazz"] == clazz][0]
-    ps = n["parameter"]
-    p = [x for x in ps if x["name"] == param][0]
+    p = get_nodes_index().params[(clazz, param)]
     t = None
     if p["type"].lower() == 'any':
         t = determine_value_type(v)
@@ -103,6 +154,71 @@ def find_custom_node_params(code, main_func: str) -> CustomNodeIOParams:
     return CustomNodeIOParams(inputs=inputs, outputs=outputs, params=params[2:])
 
 
+class CustomNodeCache:
+    """
+    Bounded LRU cache of the results of the analysis of custom node code, keyed by the hash of the code.
+    Only immutable results are stored, since they are shared among requests.
+    """
+
+    def __init__(self, max_size: int = CUSTOM_NODE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, code: str, compute: Callable[[], Any]):
+        """
+        Returns the cached result of the analysis of the code, computing it on a miss.
+        Errors raised by the analysis are not cached.
+        """
+        key = (hashlib.sha256(code.encode('utf-8')).hexdigest(), *key)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        result = compute()
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return result
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "max_size": self.max_size}
+
+
+custom_node_cache = CustomNodeCache()
+
+
+def get_custom_node_code(code: str, function_name: str) -> str:
+    """
+    Returns the source of the main function of a custom node, with the other functions of its code inlined
+    """
+    return custom_node_cache.get(('code', function_name), code,
+                                 lambda: ast.unparse(parse_custom_node_code(code, function_name)))
+
+
+def get_custom_node_params(code: str, function_name: str) -> CustomNodeIOParams:
+    """
+    Returns the inputs, outputs and parameters of a custom node
+    """
+    params = custom_node_cache.get(('params', function_name), code,
+                                   lambda: find_custom_node_params(parse_custom_node_code(code, function_name),
+                                                                   function_name).dict())
+    return CustomNodeIOParams(**params)
+
+
+def get_custom_node_requirements(code: str) -> FrozenSet[str]:
+    """
+    Returns the top level packages imported by the code of a custom node
+    """
+    return custom_node_cache.get(('requirements',), code, lambda: frozenset(parse_custom_node_requirements(code)))
+
+
 def get_variables_matches(code, regex):
     """
     Returns the matches given a string and a regex
@@ -127,18 +243,15 @@ def check_custom_node_code(custom_nodes: List[CustomNode]):
                 raise CustomNodeConfigurationError(f"Duplicated function name in node {node.node_id}!")
 
 
-def get_nodes_structure() -> list[NodeStructure]:
+def get_nodes_catalog() -> NodesCatalog:
     """
-    Returns the available Rain nodes
+    Returns the serialized Rain nodes
     """
-    return rain_structure["nodes"]
+    return get_nodes_index().catalog
 
 
 def get_node(clazz) -> Optional[NodeStructure]:
     """
     Returns the node with the specified clazz
     """
-    for node in rain_structure["nodes"]:
-        if node["clazz"] == clazz:
-            return node
-    return None
+    return get_nodes_index().nodes.get(clazz)
@@ -0,0 +1,125 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import os
+import selectors
+import time
+from typing import Callable, Dict, List, Optional
+import subprocess
+
+OUTPUT_MAX_LINE_BYTES = int(os.environ.get("OUTPUT_MAX_LINE_BYTES", str(64 * 1024)))
+OUTPUT_READ_BYTES = 64 * 1024
+EXECUTION_ABORT_CHECK_SECONDS = float(os.environ.get("EXECUTION_ABORT_CHECK_SECONDS", "1"))
+TRUNCATED_MARKER = " [line truncated]"
+
+STDOUT = "stdout"
+STDERR = "stderr"
+
+
+class _Stream:
+    """
+    Splits the bytes read from a pipe into lines, keeping at most max_line_bytes of each line.
+    """
+
+    def __init__(self, name: str, max_line_bytes: int):
+        self.name = name
+        self.max_line_bytes = max_line_bytes
+        self.partial = b""
+        self.truncating = False
+
+    def feed(self, data: bytes) -> List[str]:
+        lines = []
+        *complete, rest = (self.partial + data).split(b"\n")
+        for line in complete:
+            if self.truncating:
+                # the head of the line has already been emitted
+                self.truncating = False
+                continue
+            lines.append(self._decode(line[:self.max_line_bytes], len(line) > self.max_line_bytes))
+        if len(rest) > self.max_line_bytes and not self.truncating:
+            lines.append(self._decode(rest[:self.max_line_bytes], True))
+            self.truncating = True
+        self.partial = b"" if self.truncating else rest
+        return lines
+
+    def close(self) -> List[str]:
+        lines = [] if self.truncating or not self.partial else [self._decode(self.partial, False)]
+        self.partial = b""
+        return lines
+
+    @staticmethod
+    def _decode(line: bytes, truncated: bool) -> str:
+        text = line.decode("utf-8", errors="replace").rstrip("\r")
+        return text + TRUNCATED_MARKER if truncated else text
+
+
+class OutputReader:
+    """
+    Reads the stdout and the stderr of a process at the same time, without ever blocking on one of them.
+
+    The pipes are read in binary chunks through a selector, split into lines of at most max_line_bytes and
+    handed to the line function in batches, one per chunk, together with the name of the stream. The abort
+    function is called every abort_interval seconds, even while the process prints nothing, and the reading
+    stops as soon as it returns True.
+    """
+
+    def __init__(self, process: subprocess.Popen, lines_function: Callable[[str, List[str]], None],
+                 abort_function: Optional[Callable[[], bool]] = None,
+                 abort_interval: float = EXECUTION_ABORT_CHECK_SECONDS,
+                 max_line_bytes: int = OUTPUT_MAX_LINE_BYTES):
+        self._process = process
+        self._lines_function = lines_function
+        self._abort_function = abort_function
+        self._abort_interval = abort_interval
+        self._max_line_bytes = max_line_bytes
+
+    def read(self) -> bool:
+        """
+        Method that reads the output until both pipes are closed, returning False if the reading was aborted.
+        """
+        streams: Dict[int, _Stream] = {}
+        with selectors.DefaultSelector() as selector:
+            for name, pipe in ((STDOUT, self._process.stdout), (STDERR, self._process.stderr)):
+                if pipe is not None:
+                    os.set_blocking(pipe.fileno(), False)
+                    selector.register(pipe.fileno(), selectors.EVENT_READ)
+                    streams[pipe.fileno()] = _Stream(name, self._max_line_bytes)
+
+            next_check = time.monotonic() + self._abort_interval
+            while streams:
+                for key, _ in selector.select(timeout=max(0.0, next_check - time.monotonic())):
+                    stream = streams[key.fd]
+                    try:
+                        data = os.read(key.fd, OUTPUT_READ_BYTES)
+                    except BlockingIOError:
+                        continue
+                    if data:
+                        lines = stream.feed(data)
+                    else:
+                        lines = stream.close()
+                        selector.unregister(key.fd)
+                        del streams[key.fd]
+                    if lines:
+                        self._lines_function(stream.name, lines)
+
+                if time.monotonic() >= next_check:
+                    if self._abort_function is not None and self._abort_function():
+                        return False
+                    next_check = time.monotonic() + self._abort_interval
+
+        return True
@@ -19,7 +19,7 @@
 import sys
 import uuid
 import os
-from typing import List
+from typing import Iterator, List
 from pymongo import MongoClient
 from datetime import datetime
 import config
@@ -33,8 +33,8 @@ USERS_COLLECTION_NAME='users'
 db = get_database()
 
 
-def get_repositories_names(user) -> List[str]:
-    """ Returns the immediate subdirectories names of the output dir. """
+def get_repositories_names(user, limit: int = 0, after: str = None) -> Iterator[dict]:
+    """ Yields the repositories of the user, up to limit and starting after the given repository id. """
     target_id = user["email"]
     organization = user["organization"]
     query = {
@@ -44,19 +44,21 @@ def get_repositories_names(user) -> List[str]:
             {"users": organization}
         ]
         }
-    repos = db.get_all_documents_fields(REPOSITORIES_COLLECTION_NAME, {"_id": 1, "name": 1, "owner": 1}, query)
+    repos = db.iter_documents_fields(REPOSITORIES_COLLECTION_NAME, {"_id": 1, "name": 1, "owner": 1}, query,
+                                     limit=limit, after=after)
     for repo in repos:
         if repo["owner"] == target_id:
             repo["owner"] = True
         else: 
             repo["owner"] = False
-    return repos
+        yield repo
 
 
-def get_archived_repositories_names(user) -> List[str]:
-    """ Returns the immediate subdirectories names of the output dir. """
+def get_archived_repositories_names(user, limit: int = 0, after: str = None) -> Iterator[dict]:
+    """ Yields the archived repositories of the user, up to limit and starting after the given repository id. """
     target_id = user["email"]
-    return db.get_all_documents_fields(REPOSITORIES_COLLECTION_NAME, {"_id": 1, "name": 1}, {"archived": True, "users": {"$in": [target_id]}})
+    return db.iter_documents_fields(REPOSITORIES_COLLECTION_NAME, {"_id": 1, "name": 1},
+                                    {"archived": True, "users": {"$in": [target_id]}}, limit=limit, after=after)
 
 
 def create_repository(repository_name: str, user) -> None:
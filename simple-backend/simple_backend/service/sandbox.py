@@ -0,0 +1,154 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import os
+import signal
+import subprocess
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+EXECUTION_CPU_SECONDS = int(os.environ.get("EXECUTION_CPU_SECONDS", "0"))
+EXECUTION_MEMORY_BYTES = int(os.environ.get("EXECUTION_MEMORY_BYTES", "0"))
+EXECUTION_TIMEOUT_SECONDS = float(os.environ.get("EXECUTION_TIMEOUT_SECONDS", "0"))
+EXECUTION_KILL_GRACE_SECONDS = float(os.environ.get("EXECUTION_KILL_GRACE_SECONDS", "5"))
+
+
+@dataclass
+class ExecutionLimits:
+    """
+    Limits applied to the process of a dataflow execution, 0 meaning unlimited.
+    Each queue can have its own limits, e.g. EXECUTION_CPU_SECONDS_HEAVY, the general ones applying otherwise.
+
+        Attribute
+        ----------
+
+        cpu_seconds : int
+            CPU time of the process, summed over all its threads, enforced by the kernel with SIGXCPU and then
+            SIGKILL.
+
+        memory_bytes : int
+            Data segment of the process (heap and private writable mappings), allocations above it fail with a
+            MemoryError. Address space only reserved, as thread pools of numerical libraries do, is not counted.
+
+        timeout_seconds : float
+            Wall-clock time after which the process group is killed.
+    """
+    cpu_seconds: int = EXECUTION_CPU_SECONDS
+    memory_bytes: int = EXECUTION_MEMORY_BYTES
+    timeout_seconds: float = EXECUTION_TIMEOUT_SECONDS
+
+    @classmethod
+    def for_queue(cls, queue: Optional[str]) -> "ExecutionLimits":
+        """
+        Returns the limits of the executions of the given queue
+        """
+        if not queue:
+            return cls()
+
+        def value(name: str, default):
+            return type(default)(os.environ.get(f"{name}_{queue.upper()}", default))
+
+        return cls(value("EXECUTION_CPU_SECONDS", EXECUTION_CPU_SECONDS),
+                   value("EXECUTION_MEMORY_BYTES", EXECUTION_MEMORY_BYTES),
+                   value("EXECUTION_TIMEOUT_SECONDS", EXECUTION_TIMEOUT_SECONDS))
+
+    def apply(self, pid: int):
+        """
+        Sets the resource limits of a started process.
+        They are set from the parent with prlimit rather than in a preexec function, which is not safe in the
+        threaded worker, and so they can be applied to a warm interpreter too.
+        """
+        if resource is None or not hasattr(resource, "prlimit"):
+            return
+        try:
+            if self.cpu_seconds:
+                # the hard limit leaves one second to handle SIGXCPU before the kernel kills the process
+                resource.prlimit(pid, resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 1))
+            if self.memory_bytes:
+                resource.prlimit(pid, resource.RLIMIT_DATA, (self.memory_bytes, self.memory_bytes))
+        except ProcessLookupError:
+            pass
+
+
+class SandboxedProcess:
+    """
+    Runs a command in its own process group with the given limits, so that the whole tree of processes started
+    by a dataflow can be terminated together, and kills it when the wall-clock timeout expires.
+    A process already started in the same way, such as a warm interpreter, can be given instead of the command.
+    """
+
+    def __init__(self, cmd: List[str], cwd: str, limits: ExecutionLimits = None, process: subprocess.Popen = None,
+                 **popen_kwargs):
+        self.limits = limits or ExecutionLimits()
+        self.timed_out = False
+        self.process = process or subprocess.Popen(cmd, cwd=cwd, start_new_session=os.name == "posix",
+                                                   **popen_kwargs)
+        self.limits.apply(self.process.pid)
+        self._timer = None
+        if self.limits.timeout_seconds:
+            self._timer = threading.Timer(self.limits.timeout_seconds, self._timeout)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timeout(self):
+        self.timed_out = True
+        self.kill()
+
+    def kill(self, grace_seconds: float = EXECUTION_KILL_GRACE_SECONDS):
+        """
+        Method that terminates the process group, killing it if it is still alive after the grace period
+        """
+        if self.process.poll() is not None:
+            return
+        self._signal(signal.SIGTERM)
+        try:
+            self.process.wait(grace_seconds)
+        except subprocess.TimeoutExpired:
+            self._signal(signal.SIGKILL if hasattr(signal, "SIGKILL") else signal.SIGTERM)
+
+    def _signal(self, sig: int):
+        try:
+            if os.name == "posix":
+                os.killpg(self.process.pid, sig)
+            else:
+                self.process.send_signal(sig)
+        except ProcessLookupError:
+            pass
+
+    def close(self):
+        """
+        Method that stops the timeout and makes sure that no process of the group outlives the execution
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+        self.kill(grace_seconds=0)
+        if os.name == "posix":
+            self._signal(signal.SIGKILL)
+        self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
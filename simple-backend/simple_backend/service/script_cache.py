@@ -0,0 +1,105 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Union
+from schemas.nodes import CustomNode, Node
+from service.database_service import get_database
+from service.script_generator import TEMPLATE_NAME
+
+SCRIPT_CACHE_SIZE = int(os.environ.get("SCRIPT_CACHE_SIZE", "256"))
+SCRIPT_CACHE_TTL_SECONDS = int(os.environ.get("SCRIPT_CACHE_TTL_SECONDS", "3600"))
+SCRIPT_CACHE_SHARED = os.environ.get("SCRIPT_CACHE_SHARED", "false").lower() == "true"
+SCRIPTS_CACHE_COLLECTION_ID = 'scripts_cache'
+
+
+def configuration_hash(nodes: List[Union[CustomNode, Node]]) -> str:
+    """
+    Returns the canonical hash of a list of nodes, covering their parameters, edges and custom code.
+    The order of the nodes is part of the hash since it affects the generated script, and so is the name of the
+    template, which changes with its content, so that the scripts rendered by a previous template are not served.
+    """
+    configuration = {"template": TEMPLATE_NAME,
+                     "nodes": [{"type": type(node).__name__, **node.dict()} for node in nodes]}
+    content = json.dumps(configuration, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class ScriptCache:
+    """
+    Bounded LRU cache of the generated scripts, whose entries expire after ttl seconds.
+
+    If a database is given, it is used as a second tier shared by all the API workers: the scripts missing
+    from the local cache are looked up there, and the generated ones are stored there too.
+    """
+
+    def __init__(self, max_size: int = SCRIPT_CACHE_SIZE, ttl: int = SCRIPT_CACHE_TTL_SECONDS, db=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._db = db
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            self._entries.pop(key, None)
+
+        if self._db is not None:
+            document = self._db.get_document(SCRIPTS_CACHE_COLLECTION_ID, {"_id": key})
+            if document and document["created_at"] > datetime.utcnow() - timedelta(seconds=self._ttl):
+                self._put_local(key, document["script"])
+                with self._lock:
+                    self._stats["shared_hits"] += 1
+                return document["script"]
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, key: str, script: str):
+        self._put_local(key, script)
+        if self._db is not None:
+            self._db.upsert_document(SCRIPTS_CACHE_COLLECTION_ID,
+                                     {"_id": key, "script": script, "created_at": datetime.utcnow()})
+
+    def _put_local(self, key: str, script: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl, script)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "max_size": self._max_size, "ttl": self._ttl,
+                    "shared": self._db is not None}
+
+
+script_cache = ScriptCache(db=get_database() if SCRIPT_CACHE_SHARED else None)
@@ -16,9 +16,13 @@
  along with this program.  If not, see <https://www.gnu.org/licenses/>.
  """
 
-import ast
-from jinja2 import Environment, BaseLoader
-from service.node_service import parse_custom_node_code
+import hashlib
+import sys
+from jinja2 import ChoiceLoader, DictLoader, Environment, ModuleLoader
+from config import here
+from service.node_service import get_custom_node_code
+
+COMPILED_TEMPLATES_DIR = here('compiled_templates')
 
 template = """import {{ rain_module }} as sr
 
@@ -50,18 +54,33 @@ df.execute()
 """
 
 
+# the name changes with the template, so that a stale precompiled module is never loaded
+TEMPLATE_NAME = 'script-' + hashlib.sha1(template.encode('utf-8')).hexdigest()[:12] + '.py.jinja'
+
+# the template is compiled once per process, or loaded from the module precompiled at build time if available
+jinja_env = Environment(loader=ChoiceLoader([ModuleLoader(COMPILED_TEMPLATES_DIR), DictLoader({TEMPLATE_NAME: template})]))
+jinja_template = jinja_env.get_template(TEMPLATE_NAME)
+
+
+def compile_template(target: str = COMPILED_TEMPLATES_DIR):
+    """
+    Precompiles the script template to a Python module in the target folder
+    """
+    Environment(loader=DictLoader({TEMPLATE_NAME: template})).compile_templates(target, zip=None)
+
+
 class ScriptGenerator:
     def __init__(self, nodes, edges):
         self._nodes = nodes
         self._edges = edges
         self._rain_module = "rain"
-        self.jinja_env = Environment(loader=BaseLoader())
-        self.jinja_template = self.jinja_env.from_string(template)
+        self.jinja_env = jinja_env
+        self.jinja_template = jinja_template
 
     def generate_script(self):
         custom_nodes = [n for n in self._nodes if n.node == 'rain.nodes.custom.custom.CustomNode']
         for c in custom_nodes:
-            c.code = ast.unparse(parse_custom_node_code(c.code, c.function_name))
+            c.code = get_custom_node_code(c.code, c.function_name)
 
         jinja_vars = {
             "rain_module": self._rain_module,
@@ -70,3 +89,9 @@ class ScriptGenerator:
         }
 
         return self.jinja_template.render(jinja_vars)
+
+
+if __name__ == '__main__':
+    if 'compile' in sys.argv:
+        compile_template()
+        print(f'Template compiled successfully to {COMPILED_TEMPLATES_DIR}!')
@@ -0,0 +1,164 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import ast
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class ScriptNode:
+    """
+    A node instantiation of a script, e.g. `node = sr.Clazz(node_id="node", param=value)`.
+    The parameters are kept as expressions, in the order of the keyword arguments.
+    """
+    name: str
+    clazz: str
+    params: Dict[str, ast.expr]
+
+
+@dataclass
+class ScriptEdge:
+    from_node: str
+    from_var: str
+    to_node: str
+    to_var: str
+
+
+@dataclass
+class ParsedScript:
+    library: str = 'rain'
+    dataflow: Optional[str] = None
+    nodes: List[ScriptNode] = field(default_factory=list)
+    edges: List[ScriptEdge] = field(default_factory=list)
+    functions: Dict[str, ast.FunctionDef] = field(default_factory=dict)
+
+
+def parse_script(code: str) -> ParsedScript:
+    """
+    Method that extracts the nodes, the edges and the functions of a Rain script, in a single walk over the
+    statements of its module.
+    Node instantiations are collected for every module name and filtered at the end, since the alias of the
+    Rain module is only known once its import has been found.
+    A script without a DataFlow or without Rain nodes is not a Rain script and raises a ValueError, as invalid
+    Python raises a SyntaxError.
+    """
+    script = ParsedScript()
+    calls = []
+    dataflows = []
+
+    for statement in ast.parse(code).body:
+        if isinstance(statement, ast.Import):
+            for alias in statement.names:
+                if alias.name == 'rain' and alias.asname:
+                    script.library = alias.asname
+        elif isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            script.functions.setdefault(statement.name, statement)
+        elif isinstance(statement, ast.Assign):
+            if (call := _node_call(statement)) is not None:
+                calls.append(call)
+            elif (dataflow := _dataflow_call(statement)) is not None:
+                dataflows.append(dataflow)
+        elif isinstance(statement, ast.Expr):
+            script.edges.extend(_add_edges_call(statement.value))
+
+    script.nodes = [node for module, node in calls if module == script.library]
+    script.dataflow = next((name for module, name in dataflows if module == script.library), None)
+    if script.dataflow is None:
+        raise ValueError("The script does not create a Rain DataFlow")
+    if not script.nodes:
+        raise ValueError("The script does not contain any Rain node")
+
+    return script
+
+
+def _attribute_path(expression: ast.expr) -> Optional[List[str]]:
+    """
+    Returns the names of a dotted expression (e.g. ['sr', 'nodes', 'Clazz']), or None if it is not a plain
+    attribute chain.
+    """
+    path = []
+    while isinstance(expression, ast.Attribute):
+        path.append(expression.attr)
+        expression = expression.value
+    if not isinstance(expression, ast.Name):
+        return None
+    path.append(expression.id)
+    path.reverse()
+    return path
+
+
+def _node_call(statement: ast.Assign) -> Optional[Tuple[str, ScriptNode]]:
+    """
+    Returns the module name and the node of an assignment like `node = module.Clazz(key=value, ...)`.
+    Calls with positional arguments, such as the DataFlow creation, are not nodes.
+    """
+    call = statement.value
+    if len(statement.targets) != 1 or not isinstance(statement.targets[0], ast.Name) \
+            or not isinstance(call, ast.Call) or call.args:
+        return None
+    path = _attribute_path(call.func)
+    if path is None or len(path) < 2:
+        return None
+    params = {keyword.arg: keyword.value for keyword in call.keywords if keyword.arg is not None}
+    return path[0], ScriptNode(statement.targets[0].id, '.'.join(path[1:]), params)
+
+
+def _dataflow_call(statement: ast.Assign) -> Optional[Tuple[str, str]]:
+    """
+    Returns the module name and the variable of an assignment like `df = module.DataFlow("name", ...)`.
+    """
+    call = statement.value
+    if len(statement.targets) != 1 or not isinstance(statement.targets[0], ast.Name) \
+            or not isinstance(call, ast.Call):
+        return None
+    path = _attribute_path(call.func)
+    if path is None or len(path) != 2 or path[1] != 'DataFlow':
+        return None
+    return path[0], statement.targets[0].id
+
+
+def _add_edges_call(expression: ast.expr) -> List[ScriptEdge]:
+    """
+    Returns the edges of a call like `df.add_edges([a @ 'out' > b @ 'in', ...])`.
+    """
+    if not isinstance(expression, ast.Call) or not isinstance(expression.func, ast.Attribute) \
+            or expression.func.attr != 'add_edges' or not expression.args \
+            or not isinstance(expression.args[0], (ast.List, ast.Tuple)):
+        return []
+
+    edges = []
+    for element in expression.args[0].elts:
+        if not isinstance(element, ast.Compare) or len(element.ops) != 1 or not isinstance(element.ops[0], ast.Gt):
+            continue
+        source = _port(element.left)
+        destination = _port(element.comparators[0])
+        if source and destination:
+            edges.append(ScriptEdge(source[0], source[1], destination[0], destination[1]))
+    return edges
+
+
+def _port(expression: ast.expr) -> Optional[Tuple[str, str]]:
+    """
+    Returns the node and the variable of an expression like `node @ 'var'`.
+    """
+    if isinstance(expression, ast.BinOp) and isinstance(expression.op, ast.MatMult) \
+            and isinstance(expression.left, ast.Name) and isinstance(expression.right, ast.Constant) \
+            and isinstance(expression.right.value, str):
+        return expression.left.id, expression.right.value
+    return None
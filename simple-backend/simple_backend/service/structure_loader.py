@@ -0,0 +1,207 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
+import requests
+from errors import NodesRetrievalError
+
+RAIN_STRUCTURE_CACHE_FILE = os.environ.get("RAIN_STRUCTURE_CACHE_FILE", "/tmp/rain_structure.json")
+RAIN_STRUCTURE_REFRESH_SECONDS = float(os.environ.get("RAIN_STRUCTURE_REFRESH_SECONDS", "3600"))
+RAIN_STRUCTURE_TIMEOUT_SECONDS = float(os.environ.get("RAIN_STRUCTURE_TIMEOUT_SECONDS", "10"))
+
+
+class StructureSnapshot(NamedTuple):
+    """
+    A loaded version of the Rain structure, together with the data derived from it.
+    Snapshots are never modified: a refresh builds a new one and swaps it in.
+    """
+    structure: dict
+    index: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+    mtime: float
+
+
+class StructureLoader:
+    """
+    Loads the Rain structure lazily, reading the on-disk cache first and downloading it only when missing.
+    A daemon thread then revalidates it every refresh_seconds, with a conditional request on the ETag and
+    Last-Modified of the cached copy, and reloads the cache file when another process has replaced it.
+
+    The cache file holds the validators on its first line and the structure on the second one, so that they are
+    replaced together by a single rename, and a revalidation by another process is detected by reading the first
+    line only.
+    """
+
+    def __init__(self, url: str, index_function: Callable[[dict], Any] = lambda structure: None,
+                 cache_file: str = RAIN_STRUCTURE_CACHE_FILE, refresh_seconds: float = RAIN_STRUCTURE_REFRESH_SECONDS,
+                 timeout: float = RAIN_STRUCTURE_TIMEOUT_SECONDS):
+        self.url = url
+        self.index_function = index_function
+        self.cache_file = cache_file
+        self.refresh_seconds = refresh_seconds
+        self.timeout = timeout
+        self._snapshot: Optional[StructureSnapshot] = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def snapshot(self) -> StructureSnapshot:
+        """
+        Returns the current snapshot, loading it on the first call.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._read_cache() or self._download()
+                    self._start_refresh()
+                snapshot = self._snapshot
+        return snapshot
+
+    def refresh(self) -> bool:
+        """
+        Method that revalidates the structure, swapping in a new snapshot when it changed.
+        Returns True if the snapshot has been replaced.
+        """
+        with self._lock:
+            current = self._snapshot
+            cached = self._read_cache(current)
+            if cached is not None and cached is not current:
+                self._snapshot = cached
+                return current is None or cached.structure is not current.structure
+            if current is not None and time.time() - current.mtime < self.refresh_seconds:
+                return False
+            snapshot = self._download(current)
+            replaced = current is None or snapshot.structure is not current.structure
+            self._snapshot = snapshot
+            return replaced
+
+    def _read_cache(self, current: Optional[StructureSnapshot] = None) -> Optional[StructureSnapshot]:
+        """
+        Method that reads the cache file, returning the current snapshot if the file did not change since it was
+        loaded, or None if there is no usable cache.
+        """
+        try:
+            mtime = os.stat(self.cache_file).st_mtime
+            if current is not None and current.mtime == mtime:
+                return current
+            with open(self.cache_file, "r") as f:
+                meta = json.loads(f.readline())
+                if current is not None and current.etag and current.etag == meta.get("etag"):
+                    # revalidated by another process
+                    return current._replace(mtime=mtime)
+                structure = json.loads(f.readline())
+            return self._build(structure, meta.get("etag"), meta.get("last_modified"), mtime)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _download(self, current: Optional[StructureSnapshot] = None) -> StructureSnapshot:
+        """
+        Method that downloads the structure, sending the validators of the current snapshot if any.
+        When the download fails the current snapshot is kept, so a NodesRetrievalError is raised only when there
+        is nothing to fall back to.
+        """
+        headers = {}
+        if current is not None:
+            if current.etag:
+                headers["If-None-Match"] = current.etag
+            if current.last_modified:
+                headers["If-Modified-Since"] = current.last_modified
+        try:
+            response = requests.get(url=self.url, headers=headers, timeout=self.timeout)
+            if current is not None and response.status_code == 304:
+                return self._touch(current)
+            if response.status_code != 200:
+                raise NodesRetrievalError(f"Nodes request failed: {response.reason}")
+            structure = response.json()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            mtime = self._write_cache(structure, etag, last_modified)
+            return self._build(structure, etag, last_modified, mtime)
+        except Exception as e:
+            print(f"Download of rain_structure.json failed: {e}")
+            if current is not None:
+                return current
+            if isinstance(e, NodesRetrievalError):
+                raise
+            raise NodesRetrievalError(f"Nodes request failed: {e}")
+
+    def _build(self, structure: dict, etag: Optional[str], last_modified: Optional[str],
+               mtime: float) -> StructureSnapshot:
+        return StructureSnapshot(structure, self.index_function(structure), etag, last_modified, mtime)
+
+    def _write_cache(self, structure: dict, etag: Optional[str], last_modified: Optional[str]) -> float:
+        """
+        Method that atomically replaces the cache file, returning its new mtime (or the current time if the cache
+        is not writable).
+        """
+        try:
+            directory = os.path.dirname(os.path.abspath(self.cache_file))
+            os.makedirs(directory, exist_ok=True)
+            self._write_json(directory, self.cache_file, {"etag": etag, "last_modified": last_modified}, structure)
+            return os.stat(self.cache_file).st_mtime
+        except OSError as e:
+            print(f"Unable to cache rain_structure.json: {e}")
+            return time.time()
+
+    @staticmethod
+    def _write_json(directory: str, path: str, *contents: Any):
+        # one document per line, json.dump does not indent them
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                for content in contents:
+                    json.dump(content, f)
+                    f.write("\n")
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _touch(self, current: StructureSnapshot) -> StructureSnapshot:
+        """
+        Method that marks the cached structure as revalidated, by updating the mtime of the cache file.
+        """
+        try:
+            os.utime(self.cache_file)
+            mtime = os.stat(self.cache_file).st_mtime
+        except OSError:
+            mtime = time.time()
+        return current._replace(mtime=mtime)
+
+    def _start_refresh(self):
+        if self.refresh_seconds > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, name="rain-structure-refresh", daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        # the cache file is checked more often than the url, so that the processes sharing it pick up a new
+        # structure soon after one of them has downloaded it
+        interval = max(1.0, min(self.refresh_seconds, 60.0))
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Refresh of rain_structure.json failed: {e}")
@@ -0,0 +1,290 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List
+from virtualenv import cli_run
+from errors import BadRequestError
+from service.wheelhouse import wheelhouse
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+VENV_CACHE_DIR = os.environ.get("VENV_CACHE_DIR", "/tmp/venv_cache")
+VENV_CACHE_MAX_BYTES = int(os.environ.get("VENV_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+# whitespace separated requirements preinstalled in the base environment, that the other environments extend
+BASE_ENV_REQUIREMENTS = os.environ.get("BASE_ENV_REQUIREMENTS", "")
+READY_MARKER = ".ready"
+BASE_PTH_FILE = "_rainfall_base.pth"
+
+
+def get_venv_executable(venv_loc: str, name: str) -> str:
+    """
+    Returns the path of an executable (python, pip, ...) inside the given virtual environment
+    """
+    if str(os.name).lower() == "nt":
+        venv_scripts_loc = "Scripts"
+    elif str(os.name).lower() == "posix":
+        venv_scripts_loc = "bin"
+    else:
+        raise BadRequestError("unsupported OS")
+    return os.path.join(venv_loc, venv_scripts_loc, name)
+
+
+def normalize_requirements(requirements: str) -> List[str]:
+    """
+    Method that returns the sorted list of the unique, non-empty requirements lines
+    """
+    lines = [line.strip() for line in requirements.splitlines()]
+    return sorted(set(line for line in lines if line and not line.startswith('#')))
+
+
+def requirements_key(requirements: str, base: str = None) -> str:
+    """
+    Method that returns the cache key of a requirements string.
+    The interpreter version is part of the key since a virtualenv is bound to the Python that created it, and so
+    is the base environment an overlay extends.
+    """
+    content = "\n".join([sys.version] + normalize_requirements(requirements) + ([f"base:{base}"] if base else []))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_venv_site_packages(venv_loc: str) -> str:
+    """
+    Returns the site-packages folder of the given virtual environment
+    """
+    python = get_venv_executable(venv_loc, "python")
+    return subprocess.run([python, "-c", "import sysconfig; print(sysconfig.get_paths()['purelib'])"],
+                          capture_output=True, text=True, check=True).stdout.strip()
+
+
+def _flock(lock_file, operation: str):
+    # file locks are only available on posix, where the workers run
+    if fcntl is not None:
+        fcntl.flock(lock_file, getattr(fcntl, operation))
+
+
+def _open_locked(path: Path, operation: str, blocking: bool = True):
+    """
+    Opens and locks a lock file, or returns None if blocking is False and the lock is held elsewhere.
+    Lock files are removed together with their evicted entries, so a file unlinked while waiting for its lock is
+    opened again from its path.
+    """
+    while True:
+        lock_file = open(path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, getattr(fcntl, operation) | (0 if blocking else fcntl.LOCK_NB))
+            if os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino:
+                return lock_file
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        except FileNotFoundError:
+            pass
+        lock_file.close()
+
+
+def _directory_size(path: Path) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.lstat(os.path.join(root, file)).st_size
+            except OSError:
+                pass
+    return size
+
+
+class VenvCache:
+    """
+    Content-addressed cache of virtual environments, shared by all the workers on the same host.
+
+    Each entry is a directory named after the hash of the normalized requirements, containing the virtual
+    environment and a marker file written once the environment has been built successfully. The marker holds the
+    size of the entry and its mtime is refreshed on every use, so that the least recently used entries can be
+    evicted when the disk budget is exceeded.
+
+    Two lock files for each key make sure that only one worker builds a given environment while any number of
+    executions use it: users hold the entry lock shared, and only take the build lock when the entry is not ready.
+    The builder holds both exclusively, so that it waits for the users of a failed build before replacing it, and
+    the eviction only removes the entries whose locks are both free, deleting the lock files with them.
+
+    When a base environment is configured, the other environments are overlays: a .pth file adds the
+    site-packages of the base to theirs, so that only the requirements missing from the base are installed. The
+    base entry is never evicted, since the overlays depend on it.
+    """
+
+    def __init__(self, root: str = VENV_CACHE_DIR, max_bytes: int = VENV_CACHE_MAX_BYTES,
+                 base_requirements: str = BASE_ENV_REQUIREMENTS):
+        self._root = Path(root)
+        self._max_bytes = max_bytes
+        self.base_requirements = "\n".join(base_requirements.split())
+        self._pinned = {requirements_key(self.base_requirements)} if self.base_requirements else set()
+
+    def _entry(self, key: str) -> Path:
+        return self._root / key
+
+    def _lock_path(self, key: str) -> Path:
+        return self._root / (key + ".lock")
+
+    def _build_lock_path(self, key: str) -> Path:
+        return self._root / (key + ".build.lock")
+
+    @contextmanager
+    def acquire_layered(self, requirements: str):
+        """
+        Yields the path of a virtual environment with the given requirements installed, which is the base
+        environment itself when it already has all of them, or an overlay of the base otherwise.
+        """
+        if not self.base_requirements:
+            with self.acquire(requirements) as venv_loc:
+                yield venv_loc
+            return
+
+        base = set(normalize_requirements(self.base_requirements))
+        extra = [requirement for requirement in normalize_requirements(requirements) if requirement not in base]
+        # the base is held shared while the overlay is in use, so that it cannot be rebuilt underneath it; it is
+        # built when the worker starts, so here it is only built if that failed
+        with self.acquire(self.base_requirements) as base_venv_loc:
+            if not extra:
+                yield base_venv_loc
+                return
+            with self.acquire("\n".join(extra), base=base_venv_loc) as venv_loc:
+                yield venv_loc
+
+    def base_venv(self) -> str:
+        """
+        Returns the path of the base environment, building it if needed, or None if no base is configured.
+        Workers call it once when they start, so that executions never wait for the base to be built.
+        """
+        if not self.base_requirements:
+            return None
+        with self.acquire(self.base_requirements) as base_venv_loc:
+            return base_venv_loc
+
+    @contextmanager
+    def acquire(self, requirements: str, base: str = None):
+        """
+        Yields the path of a virtual environment with the given requirements installed, building it if needed.
+        The environment must not be modified and is protected from eviction until the context is exited.
+        """
+        self._root.mkdir(parents=True, exist_ok=True)
+        key = requirements_key(requirements, base)
+        entry = self._entry(key)
+        marker = entry / READY_MARKER
+
+        lock_file = _open_locked(self._lock_path(key), "LOCK_SH")
+        built = False
+        try:
+            if not marker.exists():
+                lock_file.close()
+                lock_file = None
+                with _open_locked(self._build_lock_path(key), "LOCK_EX"):
+                    # another worker may have built the entry while this one was waiting for the build lock
+                    if marker.exists():
+                        lock_file = _open_locked(self._lock_path(key), "LOCK_SH")
+                    else:
+                        lock_file = _open_locked(self._lock_path(key), "LOCK_EX")
+                        self._build(entry, requirements, base)
+                        built = True
+                        # the eviction needs the build lock too, so it cannot take the entry while this is converted
+                        _flock(lock_file, "LOCK_SH")
+            if marker.exists():
+                os.utime(marker)
+            if built:
+                self.evict()
+            yield str(entry / "venv")
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+
+    def _build(self, entry: Path, requirements: str, base: str = None):
+        if entry.exists():
+            shutil.rmtree(entry)
+        entry.mkdir(parents=True)
+        requirements_file = entry / "requirements.txt"
+        requirements_file.write_text("\n".join(normalize_requirements(requirements)))
+
+        venv_loc = str(entry / "venv")
+        cli_run([venv_loc])
+        if base:
+            # pip sees the packages of the base as installed, while the ones installed in the overlay shadow them
+            Path(get_venv_site_packages(venv_loc), BASE_PTH_FILE).write_text(get_venv_site_packages(base) + "\n")
+        pip_cmd = [get_venv_executable(venv_loc, "pip")]
+        wheelhouse.install(pip_cmd, ["pip"], upgrade=True)
+        returncode = wheelhouse.install(pip_cmd, normalize_requirements(requirements))
+
+        # a failed install is used by the current execution, which reports the error, but is never published
+        if returncode == 0:
+            (entry / READY_MARKER).write_text(str(_directory_size(entry)))
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in its disk budget.
+        Entries in use or being built by other executions are skipped.
+        """
+        if fcntl is None or not self._root.is_dir():
+            return
+
+        entries = []
+        for entry in self._root.iterdir():
+            marker = entry / READY_MARKER
+            if not entry.is_dir() or entry.name in self._pinned:
+                continue
+            try:
+                entries.append((marker.stat().st_mtime, int(marker.read_text()), entry))
+            except (OSError, ValueError):
+                # leftovers of an interrupted or failed build
+                entries.append((0, _directory_size(entry), entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self._max_bytes:
+                break
+            if self._remove(entry):
+                total -= size
+
+    def _remove(self, entry: Path) -> bool:
+        """
+        Removes an entry and its lock files, unless it is being built or used
+        """
+        build_lock_path, lock_path = self._build_lock_path(entry.name), self._lock_path(entry.name)
+        build_lock = _open_locked(build_lock_path, "LOCK_EX", blocking=False)
+        if build_lock is None:
+            return False
+        with build_lock:
+            lock_file = _open_locked(lock_path, "LOCK_EX", blocking=False)
+            if lock_file is None:
+                return False
+            with lock_file:
+                shutil.rmtree(entry, ignore_errors=True)
+                # unlinked while still locked, the workers waiting on them open the new files
+                lock_path.unlink(missing_ok=True)
+                build_lock_path.unlink(missing_ok=True)
+        return True
+
+venv_cache = VenvCache()
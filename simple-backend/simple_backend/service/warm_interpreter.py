@@ -0,0 +1,54 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+# Bootstrap of the pre-started interpreters of the warm pool.
+#
+# It runs with the Python of the base environment, so it must only use the standard library. The modules given as
+# arguments are imported ahead of time, then the interpreter waits for a single job on stdin: a JSON object with
+# the working directory and the argv of the script to run, as if it were started with `python script.py ...`.
+
+import json
+import os
+import runpy
+import sys
+
+
+def main():
+    # the directory of this file holds the modules of the backend, which must not shadow the ones of the dataflow
+    del sys.path[0]
+    for module in sys.argv[1:]:
+        try:
+            __import__(module)
+        except Exception:
+            pass
+
+    line = sys.stdin.readline()
+    if not line.strip():
+        return
+    job = json.loads(line)
+
+    os.chdir(job["cwd"])
+    sys.argv = job["argv"]
+    sys.path.insert(0, job["cwd"])
+    sys.stdin.close()
+    sys.stdin = open(os.devnull)
+    runpy.run_path(job["argv"][0], run_name="__main__")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import json
+import os
+import subprocess
+import threading
+from typing import List, Optional
+
+WARM_POOL_SIZE = int(os.environ.get("WARM_POOL_SIZE", "1"))
+WARM_POOL_IMPORTS = os.environ.get("WARM_POOL_IMPORTS", "rain").split(",")
+WARM_INTERPRETER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "warm_interpreter.py")
+
+
+class WarmPool:
+    """
+    Pool of interpreters of the base environment started ahead of time, with the slow imports (the rain package
+    above all) already done, each waiting for the script it will run.
+
+    An interpreter runs a single script and is replaced in background when taken, so a dataflow whose
+    requirements are all in the base environment starts without creating a process or importing anything.
+    The interpreters are started as the cold ones, in their own session, and get the limits of the execution
+    when they are taken.
+    """
+
+    def __init__(self, size: int = WARM_POOL_SIZE, imports: List[str] = None):
+        self.size = size
+        self.imports = [module.strip() for module in (imports or WARM_POOL_IMPORTS) if module.strip()]
+        self._python = None
+        self._processes: List[subprocess.Popen] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _spawn(self, python: str) -> subprocess.Popen:
+        return subprocess.Popen([python, WARM_INTERPRETER, *self.imports], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                start_new_session=os.name == "posix")
+
+    def fill(self, python: str):
+        """
+        Method that starts interpreters of the given Python until the pool is full.
+        Interpreters of a different Python, left from a previous base environment, are stopped.
+        """
+        if self.size <= 0:
+            return
+        with self._lock:
+            if python != self._python:
+                self._stop(self._processes)
+                self._processes = []
+                self._python = python
+            self._processes = [p for p in self._processes if p.poll() is None]
+            missing = self.size - len(self._processes)
+            self._processes.extend(self._spawn(python) for _ in range(missing))
+
+    def take(self, python: str, cwd: str, argv: List[str]) -> Optional[subprocess.Popen]:
+        """
+        Returns a warm interpreter of the given Python running the script, or None if there is none ready.
+        """
+        process = None
+        with self._lock:
+            if python == self._python:
+                while self._processes and process is None:
+                    candidate = self._processes.pop(0)
+                    if candidate.poll() is None:
+                        process = candidate
+        if process is None:
+            self.misses += 1
+            return None
+
+        try:
+            process.stdin.write((json.dumps({"cwd": cwd, "argv": argv}) + "\n").encode("utf-8"))
+            process.stdin.close()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        threading.Thread(target=self.fill, args=(python,), daemon=True).start()
+        return process
+
+    def close(self):
+        with self._lock:
+            self._stop(self._processes)
+            self._processes = []
+
+    @staticmethod
+    def _stop(processes: List[subprocess.Popen]):
+        for process in processes:
+            try:
+                # an empty job makes the interpreter exit
+                process.stdin.close()
+                process.wait(1)
+            except (OSError, subprocess.TimeoutExpired):
+                process.kill()
+
+    def stats(self) -> dict:
+        return {"size": self.size, "ready": len(self._processes), "hits": self.hits, "misses": self.misses}
+
+
+warm_pool = WarmPool()
@@ -0,0 +1,174 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+WHEELHOUSE_DIR = os.environ.get("WHEELHOUSE_DIR", "/tmp/wheelhouse")
+DIRECT_REFERENCES_INDEX = "direct_references.json"
+DATAFLOWS_COLLECTION_NAME = 'dataflows'
+
+
+def is_direct_reference(requirement: str) -> bool:
+    """
+    Returns True if the requirement points to a VCS, an URL or a local path instead of a project name
+    """
+    return "://" in requirement or " @ " in requirement or requirement.startswith(('.', '/'))
+
+
+def _wheel_name_and_version(wheel_file: str) -> str:
+    name, version = wheel_file.split('-')[:2]
+    return f"{name}=={version}"
+
+
+class Wheelhouse:
+    """
+    Local directory of wheels used to install the requirements of the executions without reaching the index.
+
+    Installs first try to resolve every requirement offline (--no-index --find-links); on a miss the wheels are
+    downloaded or built once, stored in the wheelhouse and the offline install is retried. Direct references
+    (e.g. the git URL of the rain package) cannot be resolved offline as they are, so they are mapped to the
+    pinned name of the wheel they produced.
+    """
+
+    def __init__(self, root: str = WHEELHOUSE_DIR):
+        self._root = Path(root)
+
+    def _read_direct_references(self) -> dict:
+        try:
+            return json.loads((self._root / DIRECT_REFERENCES_INDEX).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write_direct_references(self, references: dict):
+        index = {**self._read_direct_references(), **references}
+        with tempfile.NamedTemporaryFile('w', dir=self._root, delete=False) as tmp:
+            json.dump(index, tmp)
+        os.replace(tmp.name, self._root / DIRECT_REFERENCES_INDEX)
+
+    def _offline_requirements(self, requirements: List[str]) -> Optional[List[str]]:
+        references = self._read_direct_references()
+        offline = []
+        for requirement in requirements:
+            if is_direct_reference(requirement):
+                if requirement not in references:
+                    return None
+                offline.append(references[requirement])
+            else:
+                offline.append(requirement)
+        return offline
+
+    def _store(self, wheel_dir: str) -> List[str]:
+        # wheels are moved one by one so that concurrent offline installs never see a partial file
+        stored = []
+        for wheel_file in os.listdir(wheel_dir):
+            if wheel_file.endswith('.whl'):
+                os.replace(os.path.join(wheel_dir, wheel_file), self._root / wheel_file)
+                stored.append(wheel_file)
+        return stored
+
+    def add(self, pip_cmd: List[str], requirements: List[str]) -> int:
+        """
+        Downloads or builds the wheels of the given requirements, and their dependencies, into the wheelhouse
+        """
+        self._root.mkdir(parents=True, exist_ok=True)
+        references = {}
+        for requirement in filter(is_direct_reference, requirements):
+            with tempfile.TemporaryDirectory(dir=self._root) as wheel_dir:
+                result = subprocess.run(pip_cmd + ["wheel", "--no-deps", "--wheel-dir", wheel_dir, requirement])
+                if result.returncode != 0:
+                    return result.returncode
+                stored = self._store(wheel_dir)
+                if stored:
+                    references[requirement] = _wheel_name_and_version(stored[0])
+        if references:
+            self._write_direct_references(references)
+
+        # a direct reference that produced no wheel is resolved by pip again
+        offline = self._offline_requirements(requirements) or requirements
+        with tempfile.TemporaryDirectory(dir=self._root) as wheel_dir:
+            result = subprocess.run(pip_cmd + ["wheel", "--wheel-dir", wheel_dir, "--find-links", str(self._root)]
+                                    + offline)
+            self._store(wheel_dir)
+        return result.returncode
+
+    def install(self, pip_cmd: List[str], requirements: List[str], upgrade: bool = False) -> int:
+        """
+        Installs the requirements from the wheelhouse, populating it from the network on a miss.
+        Returns the exit code of the last pip invocation.
+        """
+        if not requirements:
+            return 0
+        options = ["install", "--upgrade"] if upgrade else ["install"]
+        offline_options = options + ["--no-index", "--find-links", str(self._root)]
+
+        offline = self._offline_requirements(requirements) if self._root.is_dir() else None
+        if offline is not None and subprocess.run(pip_cmd + offline_options + offline).returncode == 0:
+            return 0
+
+        if self.add(pip_cmd, requirements) == 0:
+            offline = self._offline_requirements(requirements)
+            if offline is not None and subprocess.run(pip_cmd + offline_options + offline).returncode == 0:
+                return 0
+
+        print("Offline install failed, falling back to the package index.")
+        return subprocess.run(pip_cmd + options + requirements).returncode
+
+
+wheelhouse = Wheelhouse()
+
+
+def seed(extra_requirements: List[str]):
+    """
+    Pre-seeds the wheelhouse with the requirements of every stored dataflow
+    """
+    from service.database_service import get_database
+
+    requirements = set(extra_requirements)
+    requirements.add("pip")
+    if os.environ.get("RAIN_REPOSITORY_URL"):
+        requirements.add(os.environ.get("RAIN_REPOSITORY_URL"))
+    for dataflow in get_database().get_all_documents_fields(DATAFLOWS_COLLECTION_NAME, {"requirements": 1}) or []:
+        requirements.update(line.strip() for line in dataflow["requirements"].splitlines() if line.strip())
+
+    pip_cmd = [sys.executable, "-m", "pip"]
+    failed = []
+    # one requirement at a time, so that a broken dataflow does not prevent seeding the others
+    for requirement in sorted(requirements):
+        if wheelhouse.add(pip_cmd, [requirement]) != 0:
+            failed.append(requirement)
+    print(f"Wheelhouse {WHEELHOUSE_DIR} seeded with {len(requirements) - len(failed)} requirements.")
+    if failed:
+        print("Failed requirements: " + ", ".join(failed))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manages the wheelhouse used by the workers to install requirements")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    seed_parser = subparsers.add_parser("seed", help="download the wheels required by every stored dataflow")
+    seed_parser.add_argument("requirements", nargs="*", help="additional requirements to add to the wheelhouse")
+    args = parser.parse_args()
+    if args.command == "seed":
+        sys.exit(seed(args.requirements))
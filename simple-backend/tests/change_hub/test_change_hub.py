@@ -0,0 +1,142 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import asyncio
+import queue
+import time
+from service.change_hub import ChangeStreamHub, Subscription
+
+
+def change(i: int, key: str) -> dict:
+    return {"_id": {"_data": f"t{i:03d}"}, "key": key}
+
+
+class FakeStream:
+    """
+    Change stream yielding the given changes, then the ones put in the live queue, and None while idle.
+    A stream closed before being read fails, as one opened with an unknown resume token.
+    """
+
+    def __init__(self, changes, live: queue.Queue = None):
+        self.changes = list(changes)
+        self.live = live
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.changes:
+            return self.changes.pop(0)
+        if self.live is None:
+            if self.closed:
+                raise StopIteration
+            time.sleep(0.01)
+            return None
+        try:
+            return self.live.get(timeout=0.01)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.closed = True
+
+
+def make_hub(history: list, live: queue.Queue, resumed: list):
+    def resume(token):
+        stream = FakeStream([c for c in history if c["_id"]["_data"] > token])
+        if token == "unknown":
+            stream.closed = True
+        resumed.append(stream)
+        return stream
+
+    return ChangeStreamHub("test", lambda: FakeStream([], live), lambda c: c["key"], resume)
+
+
+async def consume(subscription: Subscription, count: int) -> list:
+    received = []
+    async for item in subscription:
+        received.append(item and item["_id"]["_data"])
+        if len(received) == count:
+            break
+    return received
+
+
+class TestChangeStreamHub:
+
+    def test_resume_hands_over_to_shared_stream(self):
+        async def run():
+            history = [change(i, "a" if i % 2 else "b") for i in range(1, 10)]
+            live, resumed = queue.Queue(), []
+            hub = make_hub(history, live, resumed)
+            hub.attach(Subscription(), "other")
+            await asyncio.sleep(0.1)
+            for i in range(10, 13):
+                history.append(change(i, "a"))
+                live.put(change(i, "a"))
+            await asyncio.sleep(0.1)
+
+            subscription = Subscription()
+            hub.attach(subscription, "a", "t002")
+            received = await asyncio.wait_for(consume(subscription, 7), 5)
+            await asyncio.sleep(0.1)
+            assert received == ["t003", "t005", "t007", "t009", "t010", "t011", "t012"]
+            assert resumed[0].closed
+            assert hub.stats()["subscribers"] == 2
+
+            live.put(change(13, "a"))
+            assert await asyncio.wait_for(consume(subscription, 1), 5) == ["t013"]
+
+        asyncio.run(run())
+
+    def test_resume_unknown_token_resets(self):
+        async def run():
+            live = queue.Queue()
+            hub = make_hub([], live, [])
+            subscription = Subscription()
+            hub.attach(subscription, "a", "unknown")
+            await asyncio.sleep(0.1)
+            live.put(change(1, "a"))
+            assert await asyncio.wait_for(consume(subscription, 2), 5) == [None, "t001"]
+
+        asyncio.run(run())
+
+    def test_replay_compacted_changes(self):
+        async def run():
+            live = queue.Queue()
+            hub = ChangeStreamHub("test", lambda: FakeStream([], live), lambda c: c["key"],
+                                  compact_function=lambda c: {**c, "lines": None},
+                                  restore_function=lambda changes: [{**c, "lines": "restored"} for c in changes])
+            subscription = Subscription()
+            hub.attach(subscription, "a")
+            for i in range(1, 4):
+                live.put({**change(i, "a"), "lines": "live"})
+            received = []
+            async for item in subscription:
+                received.append(item["lines"])
+                if len(received) == 3:
+                    break
+            assert received == ["live"] * 3
+            assert all(c["lines"] is None for _, _, c in hub._replay)
+
+            resumed = Subscription()
+            hub.attach(resumed, "a", "t001")
+            replayed = [await resumed.__anext__() for _ in range(2)]
+            assert [(c["_id"]["_data"], c["lines"]) for c in replayed] == [("t002", "restored"), ("t003", "restored")]
+
+        asyncio.run(run())
@@ -0,0 +1,42 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+from service.dag import Dag
+
+
+class TestDag:
+
+    def test_sort_ok(self):
+        dag = Dag([("a", "b"), ("a", "c"), ("c", "b"), ("b", "d"), ("a", "b")])
+        ordered, cycle = dag.sort()
+        assert ordered == ["a", "c", "b", "d"]
+        assert cycle == []
+
+    def test_sort_empty(self):
+        assert Dag([]).sort() == ([], [])
+
+    def test_sort_cycle(self):
+        dag = Dag([("a", "b"), ("b", "c"), ("c", "d"), ("d", "b"), ("d", "e")])
+        ordered, cycle = dag.sort()
+        assert ordered == ["a"]
+        assert sorted(cycle) == ["b", "c", "d"]
+        assert all((cycle[i], cycle[(i + 1) % len(cycle)]) in {("b", "c"), ("c", "d"), ("d", "b")}
+                   for i in range(len(cycle)))
+
+    def test_sort_self_loop(self):
+        assert Dag([("a", "a")]).sort() == ([], ["a"])
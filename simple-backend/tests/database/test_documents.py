@@ -0,0 +1,152 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import json
+import pytest
+from databases.mongodb import MongoDB
+from controller.json_stream import encode_json_array, json_array_response
+
+
+def matches(document: dict, query: dict) -> bool:
+    """
+    Evaluates the subset of the query language used by the keyset pagination
+    """
+    for field, condition in query.items():
+        if field == "$and":
+            if not all(matches(document, q) for q in condition):
+                return False
+        elif field == "$or":
+            if not any(matches(document, q) for q in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(field)
+            for operator, operand in condition.items():
+                if value is None or not {"$gt": value > operand, "$lt": value < operand}[operator]:
+                    return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.closed = True
+
+
+class FakeCollection:
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.cursors = []
+
+    def find_one(self, query, projection=None):
+        return next((d for d in self.documents if matches(d, query)), None)
+
+    def find(self, query, projection=None, sort=(), limit=0):
+        documents = [d for d in self.documents if matches(d, query)]
+        for field, direction in reversed(sort):
+            documents.sort(key=lambda d: d[field], reverse=direction < 0)
+        cursor = FakeCursor(documents[:limit] if limit else documents)
+        self.cursors.append(cursor)
+        return cursor
+
+
+@pytest.fixture
+def database():
+    # the client connects lazily, the collections are replaced by fakes
+    db = MongoDB("mongodb://localhost:27017/?directConnection=true")
+    db.db = {
+        "executions": FakeCollection([
+            {"_id": f"e{i}", "issuer": "user" if i != 3 else "other", "created_at": i // 2, "status": "Success"}
+            for i in reversed(range(8))]),
+    }
+    return db
+
+
+def page_ids(database, **kwargs):
+    return [d["id"] for d in database.iter_documents_fields("executions", {"_id": 1, "status": 1},
+                                                            {"issuer": "user"}, **kwargs)]
+
+
+class TestDocuments:
+
+    def test_pages_by_id(self, database):
+        assert page_ids(database) == ["e0", "e1", "e2", "e4", "e5", "e6", "e7"]
+        assert page_ids(database, limit=3) == ["e0", "e1", "e2"]
+        assert page_ids(database, limit=3, after="e2") == ["e4", "e5", "e6"]
+        assert page_ids(database, after="e7") == []
+
+    def test_pages_by_created_at_with_ties(self, database):
+        pages, after = [], None
+        while page := page_ids(database, limit=2, after=after, sort_field="created_at"):
+            pages.append(page)
+            after = page[-1]
+        assert pages == [["e0", "e1"], ["e2", "e4"], ["e5", "e6"], ["e7"]]
+        assert page_ids(database, limit=3, after="e5", sort_field="created_at", descending=True) == \
+               ["e4", "e2", "e1"]
+
+    def test_unknown_after(self, database):
+        assert page_ids(database, after="missing", sort_field="created_at") == []
+
+    def test_projection(self, database):
+        assert list(database.iter_documents_fields("executions", {"_id": 1, "status": 1}, {"issuer": "other"})) == \
+               [{"id": "e3", "status": "Success"}]
+
+    def test_missing_field_raises(self, database):
+        with pytest.raises(KeyError):
+            list(database.iter_documents_fields("executions", {"_id": 1, "name": 1}))
+        assert all(cursor.closed for cursor in database.db["executions"].cursors)
+        assert database.get_all_documents_fields("executions", {"_id": 1, "name": 1}) is None
+
+
+class TestJsonStream:
+
+    def test_encode(self):
+        documents = [{"id": "a", "name": "è"}, {"id": "b"}]
+        body = b"".join(encode_json_array(iter(documents)))
+        assert json.loads(body) == documents
+        assert b"".join(encode_json_array([])) == b"[]"
+
+    def test_error_before_response(self):
+        def failing():
+            raise ConnectionError("unreachable")
+            yield
+
+        with pytest.raises(ConnectionError):
+            json_array_response(failing())
+
+    def test_error_aborts_stream(self):
+        def failing():
+            yield {"id": "a"}
+            raise KeyError("name")
+
+        body = encode_json_array(failing())
+        assert next(body) + next(body) == b'[{"id":"a"}'
+        with pytest.raises(KeyError):
+            next(body)
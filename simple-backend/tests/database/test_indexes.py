@@ -0,0 +1,151 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import asyncio
+import os
+from types import SimpleNamespace
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from controller import standard_auth_api
+from databases.mongodb import MongoDB
+from service import execution_service, log_storage, repository_service
+from service.database_indexes import ensure_indexes
+
+MONGODB_URL = os.environ.get("MONGODB_URL", "mongodb://localhost:27017/?directConnection=true")
+TEST_DATABASE_NAME = "rainfall_indexes_test"
+
+USER = {"_id": "user", "email": "user", "organization": "organization"}
+
+# the hot queries of the services, each one run against a recording database to capture its reads
+HOT_QUERIES = {
+    "get_all_executions_status": lambda: list(execution_service.get_all_executions_status(USER)),
+    "get_all_executions_status_page": lambda: list(execution_service.get_all_executions_status(USER,
+                                                                                               after="execution")),
+    "get_execution_durations": lambda: execution_service.get_execution_durations("pipeline"),
+    "get_log_chunks": lambda: log_storage.get_log_chunks("execution"),
+    "get_log_tail": lambda: log_storage.get_log_tail("execution"),
+    "get_repositories_names": lambda: list(repository_service.get_repositories_names(USER)),
+    "get_repositories_names_page": lambda: list(repository_service.get_repositories_names(USER,
+                                                                                         after="repository")),
+    "get_archived_repositories_names": lambda: list(repository_service.get_archived_repositories_names(USER)),
+    "add_dataflow_to_repo": lambda: repository_service.add_dataflow_to_repo({"_id": "dataflow"}, "repository"),
+    "get_current_user": lambda: asyncio.run(standard_auth_api.get_current_user(
+        standard_auth_api.create_access_token({"sub": "user"}))),
+}
+SERVICE_DATABASES = [execution_service.db, log_storage.db, repository_service.db, standard_auth_api.db]
+
+
+class RecordingCursor(list):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+class RecordingCollection:
+    """
+    Collection that records the filter and the sort of the reads, finding one document for every find_one so that
+    the services go on with their following queries
+    """
+
+    def __init__(self, name: str, queries: list):
+        self.name = name
+        self.queries = queries
+
+    def find(self, filter=None, projection=None, sort=None, limit=0):
+        self.queries.append((self.name, filter or {}, sort))
+        return RecordingCursor()
+
+    def find_one(self, filter=None, projection=None):
+        self.queries.append((self.name, filter or {}, None))
+        return {"_id": "document", "created_at": "2024-01-01 00:00:00", "username": "user", "email": "user",
+                "organization": "organization"}
+
+    def insert_one(self, document):
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    def update_one(self, filter, update):
+        return SimpleNamespace(matched_count=1, modified_count=1)
+
+
+class RecordingDatabase(dict):
+
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+
+    def __missing__(self, name):
+        self[name] = RecordingCollection(name, self.queries)
+        return self[name]
+
+
+def capture_queries(monkeypatch, query: str) -> list:
+    """
+    Runs a hot query of the services, returning the (collection, filter, sort) of the reads it made
+    """
+    recording = RecordingDatabase()
+    for service_db in SERVICE_DATABASES:
+        monkeypatch.setattr(service_db, "db", recording)
+    HOT_QUERIES[query]()
+    return recording.queries
+
+
+def plan_stages(plan: dict):
+    """
+    Returns the names of all the stages of a query plan
+    """
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+@pytest.fixture(scope="module")
+def database():
+    client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip("MongoDB is not reachable")
+    db = MongoDB(MONGODB_URL)
+    db.db = db.client[TEST_DATABASE_NAME]
+    ensure_indexes(db)
+    yield db.db
+    client.drop_database(TEST_DATABASE_NAME)
+
+
+class TestIndexes:
+
+    @pytest.mark.parametrize("query", HOT_QUERIES.keys())
+    def test_queries_captured(self, monkeypatch, query):
+        assert capture_queries(monkeypatch, query), f"{query} does not read from the database"
+
+    @pytest.mark.parametrize("query", HOT_QUERIES.keys())
+    def test_no_collection_scan(self, database, monkeypatch, query):
+        for collection, filter, sort in capture_queries(monkeypatch, query):
+            cursor = database[collection].find(filter)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = cursor.explain()["queryPlanner"]["winningPlan"]
+            assert "COLLSCAN" not in plan_stages(plan), f"{query} scans the whole {collection} collection: {filter}"
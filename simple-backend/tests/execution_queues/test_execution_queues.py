@@ -0,0 +1,66 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import pytest
+from errors import BadRequestError
+from service.execution_queues import (BATCH, EXECUTION_DEFAULT_QUEUE, EXECUTION_HEAVY_SECONDS,
+                                      EXECUTION_INTERACTIVE_SECONDS, HEAVY, INTERACTIVE, QUEUE_PRIORITIES,
+                                      infer_execution_queue, requirement_name, route_execution)
+
+
+def no_history():
+    pytest.fail("The history must not be read when the queue is given")
+
+
+class TestExecutionQueues:
+
+    def test_requirement_name(self):
+        assert requirement_name("torch[cuda]>=2.0") == "torch"
+        assert requirement_name("Scikit_Learn==1.3") == "scikit-learn"
+        assert requirement_name("pandas") == "pandas"
+
+    def test_heavy_requirements(self):
+        assert infer_execution_queue("pandas\nTorch>=2.0\n", [1.0]) == HEAVY
+        assert infer_execution_queue("# torch\npandas\n", [1.0]) == INTERACTIVE
+
+    def test_median_duration(self):
+        interactive = EXECUTION_INTERACTIVE_SECONDS
+        heavy = EXECUTION_HEAVY_SECONDS
+        assert infer_execution_queue("", [interactive]) == INTERACTIVE
+        # a single slow execution does not move the dataflow to another queue
+        assert infer_execution_queue("", [1.0, 1.0, heavy * 10]) == INTERACTIVE
+        assert infer_execution_queue("", [interactive + 1]) == BATCH
+        assert infer_execution_queue("", [heavy, heavy, 1.0]) == HEAVY
+
+    def test_no_history(self):
+        assert infer_execution_queue("pandas", []) == EXECUTION_DEFAULT_QUEUE
+
+    def test_inferred_queue_and_priority(self):
+        assert route_execution("", None, None, lambda: [1.0]) == (INTERACTIVE, QUEUE_PRIORITIES[INTERACTIVE])
+        assert route_execution("torch", None, None, lambda: []) == (HEAVY, QUEUE_PRIORITIES[HEAVY])
+
+    def test_given_queue(self):
+        assert route_execution("torch", BATCH, None, no_history) == (BATCH, QUEUE_PRIORITIES[BATCH])
+
+    def test_given_priority(self):
+        assert route_execution("", None, 0, lambda: [1.0]) == (INTERACTIVE, 0)
+        assert route_execution("", HEAVY, 9, no_history) == (HEAVY, 9)
+
+    def test_unknown_queue(self):
+        with pytest.raises(BadRequestError):
+            route_execution("", "unknown", None, no_history)
@@ -0,0 +1,77 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import pytest
+from errors import BadRequestError
+from service.layout import LAYER_SPACING, NODE_SPACING, compute_layout, layered_layout
+
+
+def layers(positions):
+    """
+    Returns the nodes of each layer, from top to bottom
+    """
+    columns = {}
+    for node, (x, y) in sorted(positions.items(), key=lambda item: item[1][1]):
+        columns.setdefault(x, []).append(node)
+    return [columns[x] for x in sorted(columns)]
+
+
+class TestLayeredLayout:
+
+    def test_chain(self):
+        positions = layered_layout(["a", "b", "c"], [("a", "b"), ("b", "c")])
+        assert positions == {"a": [0.0, 0.0], "b": [float(LAYER_SPACING), 0.0], "c": [2.0 * LAYER_SPACING, 0.0]}
+
+    def test_longest_path(self):
+        # d is placed after its farthest predecessor
+        positions = layered_layout(["a", "b", "c", "d"], [("a", "b"), ("b", "c"), ("c", "d"), ("a", "d")])
+        assert layers(positions) == [["a"], ["b"], ["c"], ["d"]]
+
+    def test_centered_layers(self):
+        positions = layered_layout(["a", "b", "c"], [("a", "b"), ("a", "c")])
+        assert positions["a"] == [0.0, NODE_SPACING / 2]
+        assert positions["b"] == [float(LAYER_SPACING), 0.0]
+        assert positions["c"] == [float(LAYER_SPACING), float(NODE_SPACING)]
+
+    def test_crossings(self):
+        # the successors follow the order of their predecessors, so the edges do not cross
+        nodes = ["a", "b", "x", "y"]
+        positions = layered_layout(nodes, [("b", "x"), ("a", "y")])
+        assert layers(positions) == [["a", "b"], ["y", "x"]]
+
+    def test_isolated_nodes(self):
+        positions = layered_layout(["a", "lonely", "b"], [("a", "b")])
+        assert layers(positions) == [["a", "lonely"], ["b"]]
+
+    def test_cycle(self):
+        positions = layered_layout(["a", "b", "c", "d"], [("a", "b"), ("b", "c"), ("c", "b"), ("c", "d")])
+        # the nodes depending on the cycle go after all the others
+        assert layers(positions) == [["a"], ["b", "c", "d"]]
+
+    def test_deterministic(self):
+        nodes = [f"n{i}" for i in range(20)]
+        edges = [(f"n{i}", f"n{j}") for i in range(20) for j in (2 * i + 1, 2 * i + 2) if j < 20]
+        assert layered_layout(nodes, edges) == layered_layout(list(nodes), list(edges))
+        assert len({tuple(position) for position in layered_layout(nodes, edges).values()}) == len(nodes)
+
+    def test_empty(self):
+        assert layered_layout([], []) == {}
+
+    def test_unknown_layout(self):
+        with pytest.raises(BadRequestError):
+            compute_layout("unknown", ["a"], [])
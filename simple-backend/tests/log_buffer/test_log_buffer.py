@@ -0,0 +1,87 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import threading
+from service.log_buffer import LogBuffer
+
+
+class Flushes:
+    """
+    Flush function recording the batches, and signalling each one
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.flushed = threading.Event()
+
+    def __call__(self, lines):
+        self.batches.append(lines)
+        self.flushed.set()
+
+
+class TestLogBuffer:
+
+    def test_flush_on_lines(self):
+        flushes = Flushes()
+        with LogBuffer(flushes, max_lines=3, max_bytes=1024, max_delay_ms=60000) as buffer:
+            buffer.extend([f"line {i}" for i in range(7)])
+            assert flushes.batches == [["line 0", "line 1", "line 2"], ["line 3", "line 4", "line 5"]]
+        assert flushes.batches[-1] == ["line 6"]
+        assert buffer.stats == {"lines": 7, "flushes": 3, "bytes": 42}
+
+    def test_flush_on_bytes(self):
+        flushes = Flushes()
+        with LogBuffer(flushes, max_lines=100, max_bytes=10, max_delay_ms=60000) as buffer:
+            buffer.extend(["aaaa", "bbbb"])
+            assert flushes.batches == []
+            # the line would exceed the threshold, so the buffered ones are flushed first
+            buffer.append("cccc")
+            assert flushes.batches == [["aaaa", "bbbb"]]
+            buffer.append("dddddd")
+            assert flushes.batches == [["aaaa", "bbbb"], ["cccc", "dddddd"]]
+
+    def test_flush_on_bytes_of_encoded_lines(self):
+        flushes = Flushes()
+        with LogBuffer(flushes, max_lines=100, max_bytes=4, max_delay_ms=60000) as buffer:
+            buffer.append("èè")
+            assert flushes.batches == [["èè"]]
+        assert buffer.stats["bytes"] == 4
+
+    def test_flush_of_line_above_bytes(self):
+        flushes = Flushes()
+        with LogBuffer(flushes, max_lines=100, max_bytes=4, max_delay_ms=60000) as buffer:
+            buffer.append("a" * 10)
+            assert flushes.batches == [["a" * 10]]
+
+    def test_flush_on_delay(self):
+        flushes = Flushes()
+        with LogBuffer(flushes, max_lines=100, max_bytes=1024, max_delay_ms=50) as buffer:
+            buffer.append("line")
+            assert flushes.flushed.wait(5)
+            assert flushes.batches == [["line"]]
+        assert buffer.stats["flushes"] == 1
+
+    def test_close_flushes(self):
+        flushes = Flushes()
+        buffer = LogBuffer(flushes, max_lines=100, max_bytes=1024, max_delay_ms=60000)
+        buffer.append("line")
+        assert flushes.batches == []
+        buffer.close()
+        buffer.close()
+        assert flushes.batches == [["line"]]
+        assert buffer.stats == {"lines": 1, "flushes": 1, "bytes": 4}
@@ -19,6 +19,7 @@
 import pytest
 from config import here
 from schemas.nodes import NodeStructure, CustomNodeIOParams
+from service import node_service
 from tests.create_test_client import create_test_client
 
 
@@ -59,3 +60,46 @@ class TestNode:
             CustomNodeIOParams.parse_obj(response.json())
         except:
             pytest.fail()
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    catalog = node_service.build_nodes_catalog([])
+    monkeypatch.setattr(node_service, 'get_nodes_catalog', lambda: catalog)
+    return catalog
+
+
+class TestNodesCatalog:
+
+    def test_etag(self, catalog):
+        response = client.get('/api/v1/nodes', headers={'Accept-Encoding': 'identity'})
+        assert response.status_code == 200
+        assert response.headers['ETag'] == catalog.etag
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert 'Content-Encoding' not in response.headers
+        assert response.content == catalog.body
+
+    def test_gzip(self, catalog):
+        response = client.get('/api/v1/nodes', headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['ETag'] == catalog.etag[:-1] + '-gzip"'
+        assert response.json() == []
+
+    def test_not_modified(self, catalog):
+        response = client.get('/api/v1/nodes', headers={'Accept-Encoding': 'identity',
+                                                        'If-None-Match': f'"other", {catalog.etag}'})
+        assert response.status_code == 304
+        assert response.content == b''
+        assert response.headers['ETag'] == catalog.etag
+
+    def test_not_modified_gzip(self, catalog):
+        gzip_etag = catalog.etag[:-1] + '-gzip"'
+        response = client.get('/api/v1/nodes', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'W/{gzip_etag}'})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == gzip_etag
+
+    def test_stale_etag(self, catalog):
+        response = client.get('/api/v1/nodes', headers={'Accept-Encoding': 'identity', 'If-None-Match': '"stale"'})
+        assert response.status_code == 200
+        assert response.headers['ETag'] == catalog.etag
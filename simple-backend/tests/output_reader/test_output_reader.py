@@ -0,0 +1,119 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import subprocess
+import sys
+import textwrap
+import time
+from service.output_reader import OUTPUT_READ_BYTES, STDERR, STDOUT, TRUNCATED_MARKER, OutputReader
+from service.sandbox import ExecutionLimits, SandboxedProcess
+
+
+def start(script: str) -> subprocess.Popen:
+    """
+    Starts a child python process running the script, with piped output
+    """
+    return subprocess.Popen([sys.executable, "-c", textwrap.dedent(script)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def read(process: subprocess.Popen, **kwargs):
+    """
+    Reads the output of the process, returning the completion flag and the (stream, line) pairs in order
+    """
+    lines = []
+    completed = OutputReader(process, lambda stream, batch: lines.extend((stream, line) for line in batch),
+                             **kwargs).read()
+    return completed, lines
+
+
+class TestOutputReader:
+
+    def test_truncation_across_chunks(self):
+        # the long line is written in several pieces, so it spans several reads
+        process = start("""
+            import sys, time
+            for _ in range(4):
+                sys.stdout.write("a" * 8)
+                sys.stdout.flush()
+                time.sleep(0.05)
+            sys.stdout.write("\\nshort\\n")
+        """)
+        completed, lines = read(process, max_line_bytes=10)
+        process.wait()
+        assert completed
+        assert lines == [(STDOUT, "a" * 10 + TRUNCATED_MARKER), (STDOUT, "short")]
+
+    def test_truncation_of_line_longer_than_read(self):
+        process = start(f"""
+            print("b" * {3 * OUTPUT_READ_BYTES})
+            print("end", end="")
+        """)
+        completed, lines = read(process, max_line_bytes=100)
+        process.wait()
+        assert completed
+        assert lines == [(STDOUT, "b" * 100 + TRUNCATED_MARKER), (STDOUT, "end")]
+
+    def test_interleaved_streams(self):
+        process = start("""
+            import sys, time
+            for i in range(3):
+                print(f"out {i}", flush=True)
+                time.sleep(0.05)
+                print(f"err {i}", file=sys.stderr, flush=True)
+                time.sleep(0.05)
+        """)
+        completed, lines = read(process)
+        process.wait()
+        assert completed
+        assert lines == [(stream, f"{name} {i}") for i in range(3)
+                         for stream, name in ((STDOUT, "out"), (STDERR, "err"))]
+
+    def test_abort_without_output(self):
+        process = start("""
+            import time
+            time.sleep(30)
+        """)
+        checks = []
+
+        def abort():
+            checks.append(time.monotonic())
+            return len(checks) >= 3
+
+        started = time.monotonic()
+        try:
+            completed, lines = read(process, abort_function=abort, abort_interval=0.05)
+        finally:
+            process.kill()
+            process.wait()
+        assert not completed
+        assert lines == []
+        assert len(checks) == 3
+        assert time.monotonic() - started < 5
+
+    def test_timeout_without_output(self):
+        limits = ExecutionLimits(cpu_seconds=0, memory_bytes=0, timeout_seconds=0.2)
+        cmd = [sys.executable, "-c", "import time; time.sleep(30)"]
+        started = time.monotonic()
+        with SandboxedProcess(cmd, cwd=".", limits=limits,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE) as sandbox:
+            completed, lines = read(sandbox.process, abort_function=lambda: False, abort_interval=0.05)
+        assert completed
+        assert lines == []
+        assert sandbox.timed_out
+        assert time.monotonic() - started < 5
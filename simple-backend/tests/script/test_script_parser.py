@@ -0,0 +1,115 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import ast
+import pytest
+from config import here
+from service.script_parser import ScriptEdge, parse_script
+
+
+def names(script):
+    return [(node.name, node.clazz) for node in script.nodes]
+
+
+class TestScriptParser:
+
+    def test_fixture(self):
+        with open(file=here('../fixtures/script.txt'), mode='r') as script:
+            parsed = parse_script(script.read())
+        assert parsed.dataflow is not None
+        assert parsed.nodes
+
+    def test_library_alias(self):
+        parsed = parse_script(
+            "import rain as sr\n"
+            "df = sr.DataFlow('df')\n"
+            "load = sr.PandasCSVLoader(node_id='load', path='a.csv')\n"
+            "other = pd.DataFrame(data=[])\n")
+        assert parsed.library == 'sr'
+        assert parsed.dataflow == 'df'
+        assert names(parsed) == [('load', 'PandasCSVLoader')]
+        assert list(parsed.nodes[0].params) == ['node_id', 'path']
+        assert ast.literal_eval(parsed.nodes[0].params['path']) == 'a.csv'
+
+    def test_alias_declared_after_nodes(self):
+        parsed = parse_script(
+            "df = sr.DataFlow('df')\n"
+            "load = sr.PandasCSVLoader(node_id='load')\n"
+            "import rain as sr\n")
+        assert names(parsed) == [('load', 'PandasCSVLoader')]
+
+    def test_nested_clazz(self):
+        parsed = parse_script(
+            "import rain\n"
+            "df = rain.DataFlow('df')\n"
+            "node = rain.nodes.custom.CustomNode(node_id='node', **params)\n")
+        assert names(parsed) == [('node', 'nodes.custom.CustomNode')]
+        assert list(parsed.nodes[0].params) == ['node_id']
+
+    def test_not_nodes(self):
+        parsed = parse_script(
+            "import rain\n"
+            "df = rain.DataFlow('df')\n"
+            "node = rain.Clazz(node_id='node')\n"
+            "positional = rain.Clazz('positional')\n"
+            "a = b = rain.Clazz(node_id='a')\n"
+            "attribute.target = rain.Clazz(node_id='attribute')\n"
+            "call = rain.factory()(node_id='call')\n"
+            "plain = Clazz(node_id='plain')\n")
+        assert names(parsed) == [('node', 'Clazz')]
+
+    def test_edges(self):
+        parsed = parse_script(
+            "import rain\n"
+            "df = rain.DataFlow('df')\n"
+            "a = rain.A(node_id='a')\n"
+            "b = rain.B(node_id='b')\n"
+            "df.add_edges([a @ 'out' > b @ 'in', a > b, a @ 'out' < b @ 'in', a @ var > b @ 'in'])\n"
+            "df.add_edges((b @ 'out' > a @ 'in',))\n"
+            "df.add_edges(edges)\n")
+        assert parsed.edges == [ScriptEdge('a', 'out', 'b', 'in'), ScriptEdge('b', 'out', 'a', 'in')]
+
+    def test_functions(self):
+        parsed = parse_script(
+            "import rain\n"
+            "def f(i, o):\n"
+            "    pass\n"
+            "async def g(i, o):\n"
+            "    pass\n"
+            "def f(i, o, p):\n"
+            "    pass\n"
+            "df = rain.DataFlow('df')\n"
+            "node = rain.CustomNode(node_id='node', use_function=f)\n")
+        assert list(parsed.functions) == ['f', 'g']
+        assert len(parsed.functions['f'].args.args) == 2
+
+    def test_missing_dataflow(self):
+        with pytest.raises(ValueError):
+            parse_script("import rain\nnode = rain.Clazz(node_id='node')\n")
+
+    def test_dataflow_of_other_module(self):
+        with pytest.raises(ValueError):
+            parse_script("import rain as sr\ndf = rain.DataFlow('df')\nnode = sr.Clazz(node_id='node')\n")
+
+    def test_missing_nodes(self):
+        with pytest.raises(ValueError):
+            parse_script("import rain\ndf = rain.DataFlow('df')\nnode = pd.Clazz(node_id='node')\n")
+
+    def test_invalid_python(self):
+        with pytest.raises(SyntaxError):
+            parse_script("import rain\ndf = rain.DataFlow(\n")
@@ -0,0 +1,142 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import os
+import pytest
+from errors import NodesRetrievalError
+from service import structure_loader
+from service.structure_loader import StructureLoader
+
+STRUCTURE = {"nodes": [{"clazz": "A"}]}
+NEW_STRUCTURE = {"nodes": [{"clazz": "A"}, {"clazz": "B"}]}
+
+
+class FakeResponse:
+    """
+    Response of the stubbed requests.get
+    """
+
+    def __init__(self, status_code: int, structure: dict = None, etag: str = None):
+        self.status_code = status_code
+        self.reason = "Fake"
+        self.structure = structure
+        self.headers = {"ETag": etag} if etag else {}
+
+    def json(self):
+        if self.structure is None:
+            raise ValueError("No body")
+        return self.structure
+
+
+class FakeServer:
+    """
+    Stub of requests.get, answering with the queued responses and recording the request headers
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers or {})
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    return str(tmp_path / "rain_structure.json")
+
+
+def serve(monkeypatch, *responses) -> FakeServer:
+    server = FakeServer(*responses)
+    monkeypatch.setattr(structure_loader.requests, "get", server.get)
+    return server
+
+
+def make_loader(cache_file: str) -> StructureLoader:
+    return StructureLoader("http://rain/structure.json", lambda structure: len(structure["nodes"]), cache_file,
+                           refresh_seconds=0)
+
+
+class TestStructureLoader:
+
+    def test_cache_first(self, monkeypatch, cache_file):
+        server = serve(monkeypatch, FakeResponse(200, STRUCTURE, '"v1"'))
+        snapshot = make_loader(cache_file).snapshot()
+        assert snapshot.structure == STRUCTURE
+        assert snapshot.index == 1
+        assert snapshot.etag == '"v1"'
+
+        # a new process loads the cache without downloading
+        snapshot = make_loader(cache_file).snapshot()
+        assert snapshot.structure == STRUCTURE
+        assert snapshot.etag == '"v1"'
+        assert len(server.requests) == 1
+
+    def test_not_modified(self, monkeypatch, cache_file):
+        server = serve(monkeypatch, FakeResponse(200, STRUCTURE, '"v1"'), FakeResponse(304))
+        loader = make_loader(cache_file)
+        snapshot = loader.snapshot()
+
+        assert not loader.refresh()
+        assert server.requests[1]["If-None-Match"] == '"v1"'
+        assert loader.snapshot().structure is snapshot.structure
+        assert loader.snapshot().mtime == os.stat(cache_file).st_mtime
+
+    def test_modified(self, monkeypatch, cache_file):
+        serve(monkeypatch, FakeResponse(200, STRUCTURE, '"v1"'), FakeResponse(200, NEW_STRUCTURE, '"v2"'))
+        loader = make_loader(cache_file)
+        loader.snapshot()
+
+        assert loader.refresh()
+        assert loader.snapshot().structure == NEW_STRUCTURE
+        assert loader.snapshot().index == 2
+        assert make_loader(cache_file).snapshot().etag == '"v2"'
+
+    def test_rewritten_by_other_process(self, monkeypatch, cache_file):
+        server = serve(monkeypatch, FakeResponse(200, STRUCTURE, '"v1"'), FakeResponse(200, NEW_STRUCTURE, '"v2"'))
+        loader = make_loader(cache_file)
+        loader.snapshot()
+
+        other = make_loader(cache_file)
+        other.snapshot()
+        assert other.refresh()
+
+        assert loader.refresh()
+        assert loader.snapshot().structure == NEW_STRUCTURE
+        assert loader.snapshot().etag == '"v2"'
+        assert len(server.requests) == 2
+
+    def test_failed_fetch_keeps_structure(self, monkeypatch, cache_file):
+        serve(monkeypatch, FakeResponse(200, STRUCTURE, '"v1"'), ConnectionError("Unreachable"), FakeResponse(500))
+        loader = make_loader(cache_file)
+        snapshot = loader.snapshot()
+
+        assert not loader.refresh()
+        assert not loader.refresh()
+        assert loader.snapshot() is snapshot
+        assert make_loader(cache_file).snapshot().structure == STRUCTURE
+
+    def test_failed_fetch_without_cache(self, monkeypatch, cache_file):
+        serve(monkeypatch, ConnectionError("Unreachable"))
+        with pytest.raises(NodesRetrievalError):
+            make_loader(cache_file).snapshot()
+        assert not os.path.exists(cache_file)
@@ -0,0 +1,91 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import threading
+import pytest
+from service.venv_cache import READY_MARKER, VenvCache
+
+pytest.importorskip("fcntl")
+
+
+class FakeBuildVenvCache(VenvCache):
+    """
+    Cache that builds empty environments, counting the builds
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.builds = 0
+
+    def _build(self, entry, requirements, base=None):
+        self.builds += 1
+        (entry / "venv").mkdir(parents=True)
+        (entry / READY_MARKER).write_text("1")
+
+
+def run_overlapping(acquire, count: int = 2):
+    """
+    Runs count executions that only complete if they all hold their environment at the same time
+    """
+    barrier = threading.Barrier(count, timeout=5)
+    errors = []
+
+    def execution():
+        try:
+            with acquire():
+                barrier.wait()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=execution) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class TestVenvCache:
+
+    def test_acquire_shared(self, tmp_path):
+        cache = FakeBuildVenvCache(str(tmp_path), base_requirements="")
+        with cache.acquire("numpy"):
+            pass
+        assert run_overlapping(lambda: cache.acquire("numpy")) == []
+        assert cache.builds == 1
+
+    def test_acquire_build_once(self, tmp_path):
+        cache = FakeBuildVenvCache(str(tmp_path), base_requirements="")
+        assert run_overlapping(lambda: cache.acquire("numpy"), 4) == []
+        assert cache.builds == 1
+
+    def test_evict_removes_lock_files(self, tmp_path):
+        cache = FakeBuildVenvCache(str(tmp_path), max_bytes=0, base_requirements="")
+        with cache.acquire("numpy"):
+            pass
+        with cache.acquire("pandas"):
+            assert len(list(tmp_path.glob("*.lock"))) == 2
+        cache.evict()
+        assert list(tmp_path.iterdir()) == []
+
+    def test_acquire_layered_overlapping(self, tmp_path):
+        cache = FakeBuildVenvCache(str(tmp_path), base_requirements="pandas scikit-learn")
+        cache.base_venv()
+        assert run_overlapping(lambda: cache.acquire_layered("pandas\nrequests")) == []
+        assert run_overlapping(lambda: cache.acquire_layered("pandas")) == []
+        assert cache.builds == 2
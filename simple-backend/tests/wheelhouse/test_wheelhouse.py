@@ -0,0 +1,109 @@
+"""
+ Copyright (C) 2023 Università degli Studi di Camerino.
+ Authors: Alessandro Antinori, Rosario Capparuccia, Riccardo Coltrinari, Flavio Corradini, Marco Piangerelli, Barbara Re, Marco Scarpetta, Luca Mozzoni, Vincenzo Nucci
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as
+ published by the Free Software Foundation, either version 3 of the
+ License, or (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ """
+
+import json
+import sys
+import textwrap
+import pytest
+from service.wheelhouse import DIRECT_REFERENCES_INDEX, Wheelhouse, _wheel_name_and_version, is_direct_reference
+
+RAIN_URL = "git+https://github.com/SIMPLE-DataFlow/rain.git@main"
+
+# pip that logs its arguments, builds an empty wheel per requirement and fails the offline install of a direct
+# reference, as the real one does
+FAKE_PIP = """
+    import json, os, sys
+    args = sys.argv[1:]
+    with open(os.environ["FAKE_PIP_LOG"], "a") as log:
+        log.write(json.dumps(args) + "\\n")
+    requirements = [arg for arg in args if not arg.startswith("-") and arg not in ("wheel", "install")
+                    and not os.path.isdir(arg)]
+    if args[0] == "wheel":
+        wheel_dir = args[args.index("--wheel-dir") + 1]
+        for requirement in requirements:
+            name = "rain" if "://" in requirement else requirement.split("==")[0]
+            open(os.path.join(wheel_dir, f"{name}-1.0-py3-none-any.whl"), "w").close()
+    elif "--no-index" in args and any("://" in requirement for requirement in requirements):
+        sys.exit(1)
+"""
+
+
+@pytest.fixture
+def pip(tmp_path, monkeypatch):
+    script = tmp_path / "pip.py"
+    script.write_text(textwrap.dedent(FAKE_PIP))
+    log = tmp_path / "pip.log"
+    monkeypatch.setenv("FAKE_PIP_LOG", str(log))
+
+    def calls():
+        return [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+
+    return [sys.executable, str(script)], calls
+
+
+class TestWheelhouse:
+
+    def test_is_direct_reference(self):
+        assert is_direct_reference(RAIN_URL)
+        assert is_direct_reference("rain @ https://example.com/rain.zip")
+        assert is_direct_reference("./rain")
+        assert is_direct_reference("/opt/rain")
+        assert not is_direct_reference("pandas==2.0")
+        assert not is_direct_reference("pandas[performance]>=2.0; python_version >= '3.8'")
+
+    def test_wheel_name_and_version(self):
+        assert _wheel_name_and_version("rain-0.5.1-py3-none-any.whl") == "rain==0.5.1"
+
+    def test_offline_requirements(self, tmp_path):
+        wheelhouse = Wheelhouse(str(tmp_path))
+        assert wheelhouse._offline_requirements(["pandas", RAIN_URL]) is None
+        wheelhouse._write_direct_references({RAIN_URL: "rain==0.5.1"})
+        assert wheelhouse._offline_requirements(["pandas", RAIN_URL]) == ["pandas", "rain==0.5.1"]
+
+    def test_direct_references_merged(self, tmp_path):
+        wheelhouse = Wheelhouse(str(tmp_path))
+        wheelhouse._write_direct_references({RAIN_URL: "rain==0.5.1"})
+        wheelhouse._write_direct_references({"./local": "local==1.0"})
+        assert json.loads((tmp_path / DIRECT_REFERENCES_INDEX).read_text()) == {
+            RAIN_URL: "rain==0.5.1", "./local": "local==1.0"}
+
+    def test_corrupted_index(self, tmp_path):
+        (tmp_path / DIRECT_REFERENCES_INDEX).write_text("{")
+        assert Wheelhouse(str(tmp_path))._offline_requirements([RAIN_URL]) is None
+
+    def test_install_maps_direct_reference(self, tmp_path, pip):
+        pip_cmd, calls = pip
+        wheelhouse = Wheelhouse(str(tmp_path / "wheelhouse"))
+        assert wheelhouse.install(pip_cmd, ["pandas", RAIN_URL]) == 0
+
+        # the direct reference is built alone, then the offline install uses its pinned name
+        wheel, dependencies, install = calls()
+        assert wheel[:2] == ["wheel", "--no-deps"] and wheel[-1] == RAIN_URL
+        assert dependencies[0] == "wheel" and dependencies[-2:] == ["pandas", "rain==1.0"]
+        assert install[:2] == ["install", "--no-index"] and install[-2:] == ["pandas", "rain==1.0"]
+        assert (tmp_path / "wheelhouse" / "rain-1.0-py3-none-any.whl").exists()
+
+    def test_install_offline(self, tmp_path, pip):
+        pip_cmd, calls = pip
+        wheelhouse = Wheelhouse(str(tmp_path / "wheelhouse"))
+        assert wheelhouse.install(pip_cmd, ["pandas", RAIN_URL]) == 0
+        count = len(calls())
+
+        assert wheelhouse.install(pip_cmd, [RAIN_URL, "pandas"]) == 0
+        (install,) = calls()[count:]
+        assert install[:2] == ["install", "--no-index"] and install[-2:] == ["rain==1.0", "pandas"]
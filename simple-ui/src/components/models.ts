@@ -114,5 +114,7 @@ export interface ExecutionInfo {
   name?: string;
   status?: string;
   logs?: string[];
+  // sequence number of the first log chunk in logs, the earlier ones are loaded on demand
+  logs_from_seq?: number;
   ui?: string;
 }
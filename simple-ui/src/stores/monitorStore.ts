@@ -32,6 +32,10 @@ export const useMonitorStore = defineStore('monitorStore', {
     },
     addLog(log: string){
       this.execution.logs.push(log)
+    },
+    prependLogs(logs: string[], fromSeq: number) {
+      this.execution.logs.unshift(...logs)
+      this.execution.logs_from_seq = fromSeq
     }
   },
   getters: {